@@ -0,0 +1,162 @@
+"""
+Checkpoint and resume for long enumerations.
+
+A search visits the indices [start, stop) of an enumeration in increasing order, folding every visited item
+into a JSON-serializable state (partial best results, found solutions, counters). Every `save_every` items or
+`save_seconds` seconds, the cursor (the next index to visit) and the state are written together to a
+checkpoint file, atomically (write to a temporary file, then rename), so a killed search resumes exactly where
+its last checkpoint left off. Disjoint index ranges (see `split_range`) can run as independent jobs, each with
+its own checkpoint file, and their results are merged afterwards.
+
+An enumeration is a function `items(start, stop)` yielding (index, item) pairs with start <= index < stop in
+increasing order. Indices don't have to be contiguous (e.g., majority tie break orbits are indexed by the
+integer value of their label, and only one label per orbit is yielded).
+"""
+
+import json
+import os
+import time
+from typing import Callable, Iterator, Sequence
+from maximal_mechanisms import MajorityMechanism, Mechanism
+from scenarios import CredentialProbabilities
+from tie_break_orbits import label_tie_breaker, majority_tie_break_orbits
+
+def split_range(start: int, stop: int, parts: int) -> list[tuple[int, int]]:
+    """Splits [start, stop) into `parts` contiguous ranges of (almost) equal sizes"""
+    (size, extra) = divmod(stop - start, parts)
+    ranges = []
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def load_checkpoint(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+class SearchCheckpoint:
+    """
+    The progress of a search over [start, stop), persisted in a JSON file.
+
+    Attributes:
+        path (str): The checkpoint file.
+        start (int), stop (int): The index range of the search.
+        cursor (int): The next index to visit.
+        state (dict): The JSON-serializable results accumulated so far.
+        done (bool): Whether the whole range has been visited.
+
+    Methods:
+        advance(cursor): Records that all indices before cursor were visited, and saves if a save is due.
+        save(): Writes the checkpoint file atomically.
+        finish(): Marks the search as done and saves.
+    """
+    def __init__(self, path: str, start: int, stop: int, initial_state: dict = None,
+                 save_every: int = 1000, save_seconds: float = 60.0):
+        self.path = path
+        self.save_every = save_every
+        self.save_seconds = save_seconds
+        if os.path.exists(path):
+            checkpoint = load_checkpoint(path)
+            if (checkpoint["start"], checkpoint["stop"]) != (start, stop):
+                raise ValueError("Checkpoint %s is for the range [%s, %s), not [%s, %s)"
+                                 % (path, checkpoint["start"], checkpoint["stop"], start, stop))
+            self.cursor = checkpoint["cursor"]
+            self.state = checkpoint["state"]
+            self.done = checkpoint["done"]
+        else:
+            self.cursor = start
+            self.state = dict(initial_state) if initial_state is not None else {}
+            self.done = False
+        self.start = start
+        self.stop = stop
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def advance(self, cursor: int):
+        self.cursor = cursor
+        self._unsaved += 1
+        if self._unsaved >= self.save_every or time.monotonic() - self._last_save >= self.save_seconds:
+            self.save()
+
+    def save(self):
+        checkpoint = {"start": self.start, "stop": self.stop, "cursor": self.cursor,
+                      "done": self.done, "state": self.state}
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def finish(self):
+        self.cursor = self.stop
+        self.done = True
+        self.save()
+
+def resumable_search(path: str, items: Callable[[int, int], Iterator], visit: Callable[[int, object, dict], None],
+                     start: int, stop: int, initial_state: dict = None, **kwargs) -> dict:
+    """
+    Runs (or resumes) a search over [start, stop): visit(index, item, state) is called on every item not
+    visited yet and updates the state in place. Keyword arguments are passed to SearchCheckpoint.
+
+    Returns:
+        dict: The final state.
+    """
+    checkpoint = SearchCheckpoint(path, start, stop, initial_state, **kwargs)
+    if checkpoint.done:
+        return checkpoint.state
+    for (index, item) in items(checkpoint.cursor, stop):
+        visit(index, item, checkpoint.state)
+        checkpoint.advance(index + 1)
+    checkpoint.finish()
+    return checkpoint.state
+
+def sequence_items(sequence: Sequence) -> Callable[[int, int], Iterator]:
+    """The enumeration of an indexable sequence, e.g., a PriorityMechanismFamily"""
+    return lambda start, stop: ((i, sequence[i]) for i in range(start, stop))
+
+def majority_orbit_items(num_credentials: int, block_size: int = 1 << 16) -> Callable[[int, int], Iterator]:
+    """
+    The enumeration of one majority mechanism per tie break orbit (see tie_break_orbits), indexed by the
+    integer value of its label in [0, 2^number_of_tie_breaks). Items are (mechanism, orbit_size) pairs.
+    """
+    def items(start, stop):
+        for (label, orbit_size) in majority_tie_break_orbits(num_credentials, block_size, start, stop):
+            value = int("".join(str(bit) for bit in label), 2)
+            M = MajorityMechanism(num_credentials, label_tie_breaker(num_credentials, label), label,
+                                  label_defines_tie_breaker=True)
+            yield (value, (M, orbit_size))
+    return items
+
+def best_mechanism_search(path: str, items: Callable[[int, int], Iterator],
+                          probabilities: list[CredentialProbabilities], start: int, stop: int, **kwargs) -> dict:
+    """
+    A resumable search for the mechanisms with the highest success probability. Items are mechanisms, or tuples
+    whose first entry is a mechanism.
+
+    Returns:
+        dict: The best success probability ("best_value") and the indices and labels of the best mechanisms
+        ("best") in the range.
+    """
+    def visit(index, item, state):
+        M: Mechanism = item[0] if isinstance(item, tuple) else item
+        value = M.success_probability(probabilities)
+        if state["best_value"] is None or value > state["best_value"]:
+            state["best_value"] = value
+            state["best"] = [[index, M.label()]]
+        elif value == state["best_value"]:
+            state["best"].append([index, M.label()])
+
+    return resumable_search(path, items, visit, start, stop, {"best_value": None, "best": []}, **kwargs)
+
+def merge_best_results(states: list[dict]) -> dict:
+    """Merges the results of best_mechanism_search over disjoint ranges"""
+    values = [state["best_value"] for state in states if state["best_value"] is not None]
+    if len(values) == 0:
+        return {"best_value": None, "best": []}
+    best_value = max(values)
+    best = sorted(entry for state in states if state["best_value"] == best_value for entry in state["best"])
+    return {"best_value": best_value, "best": best}
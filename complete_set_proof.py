@@ -4,7 +4,9 @@
 # Step 1. List all optimal profiles (among the special scenarios only)
 # Step 2. Try to find a profile incomparable to all and satisfying some constraints
 
+import argparse
 import itertools
+from checkpoint import resumable_search
 from scenarios import can_coexist_in_profile, complement, Scenario, generate_all_scenarios, is_special
 from three_credentials import get_all_majority_mechanisms, get_all_priority_mechanisms
 
@@ -24,16 +26,16 @@ optimal_profiles = []
 
 majority_profiles = []
 majority_profiles_raw = get_all_majority_mechanisms()
-for (_, profile) in majority_profiles_raw:
-    special_scenarios_only = [s for s in profile if is_special(s)]
+for M in majority_profiles_raw:
+    special_scenarios_only = [s for s in M.profile if is_special(s)]
     majority_profiles.append(special_scenarios_only)
 
 print("#majority profiles:", len(majority_profiles))
 
 priority_profiles = []
 priority_profiles_raw = get_all_priority_mechanisms()
-for (_, profile) in priority_profiles_raw:
-    special_scenarios_only = [s for s in profile if is_special(s)]
+for M in priority_profiles_raw:
+    special_scenarios_only = [s for s in M.profile if is_special(s)]
     priority_profiles.append(special_scenarios_only)
 
 print("#priority profiles:", len(priority_profiles))
@@ -94,9 +96,8 @@ def no_clashes(profile: [Scenario]) -> bool:
             return False
     return True
 
-from constraint import Problem
-
 def constraintSolve():
+    from constraint import Problem
     problem = Problem()
     problem.addVariable("s", all_possible_profiles)
     # problem.addConstraint(no_clashes, "s")
@@ -106,5 +107,33 @@ def constraintSolve():
     if len(solutions) > 0:
         print(solutions[0])
 
+# The profile at position index of itertools.product([0, 1], repeat=...) above
+def profile_from_index(index: int) -> [Scenario]:
+    k = len(special_scenarios_without_complements)
+    return [complements[idx] if (index >> (k - 1 - idx)) & 1 else special_scenarios_without_complements[idx]
+            for idx in range(k)]
+
+# Same as constraintSolve, but resumable and splittable into index ranges of the product (see checkpoint.py)
+def checkpointedSolve(path: str, start: int = 0, stop: int = None):
+    if stop is None:
+        stop = 2**len(special_scenarios_without_complements)
+    items = lambda a, b: ((i, profile_from_index(i)) for i in range(a, b))
+    def visit(index, profile, state):
+        if is_valid_profile(profile):
+            state["solutions"].append(index)
+    state = resumable_search(path, items, visit, start, stop, {"solutions": []})
+    print(len(state["solutions"]))
+    if len(state["solutions"]) > 0:
+        print(profile_from_index(state["solutions"][0]))
+    return state
+
 if __name__ == '__main__':
-    constraintSolve()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoint", help="Checkpoint file to run the search as a resumable job")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--stop", type=int, default=None)
+    args = parser.parse_args()
+    if args.checkpoint is not None:
+        checkpointedSolve(args.checkpoint, args.start, args.stop)
+    else:
+        constraintSolve()
@@ -0,0 +1,87 @@
+"""
+Closed-form evaluation through state-count equivalence classes.
+
+`Scenario` counts its theft, leaked, lost and safe credentials. A permutation-symmetric decision, such as the
+majority count comparison, only depends on these counts, and so does the probability of a scenario when
+credentials are identically distributed. Grouping the 4^n scenarios into multinomial count classes leaves
+(n+3 choose 3) = O(n^3) classes, which makes success probabilities of symmetric mechanisms cheap for any n.
+
+Count classes are tuples indexed by St.value: (theft, leaked, lost, safe).
+"""
+
+import math
+from typing import Callable
+import numpy as np
+from maximal_mechanisms import MajorityMechanism
+from scenarios import CredentialProbabilities, St
+
+def count_classes(n: int) -> list[tuple[int, int, int, int]]:
+    return [(theft, leaked, lost, n - theft - leaked - lost)
+            for theft in range(n + 1) for leaked in range(n + 1 - theft) for lost in range(n + 1 - theft - leaked)]
+
+def class_size(counts: tuple[int, int, int, int]) -> int:
+    """The number of scenarios in the class (multinomial coefficient)"""
+    size = math.factorial(sum(counts))
+    for c in counts:
+        size //= math.factorial(c)
+    return size
+
+def iid_class_probabilities(probabilities: CredentialProbabilities, n: int) -> dict:
+    """The probability of every class when all n credentials have the same probabilities"""
+    p = probabilities.to_vector()
+    return {counts: class_size(counts) * math.prod(p[st] ** counts[st] for st in range(4))
+            for counts in count_classes(n)}
+
+def class_probabilities(probabilities: list[CredentialProbabilities]) -> dict:
+    """
+    The probability of every class when credentials are independent but not necessarily identically distributed,
+    by dynamic programming over the credentials (O(n^4) work).
+    """
+    distribution = {(0, 0, 0, 0): 1}
+    for credential_probabilities in probabilities:
+        p = credential_probabilities.to_vector()
+        next_distribution = {}
+        for (counts, probability) in distribution.items():
+            for st in range(4):
+                if p[st] == 0:
+                    continue
+                next_counts = counts[:st] + (counts[st] + 1,) + counts[st + 1:]
+                next_distribution[next_counts] = next_distribution.get(next_counts, 0) + probability * p[st]
+        distribution = next_distribution
+    return distribution
+
+def symmetric_success_probability(decide: Callable[[tuple[int, int, int, int]], bool],
+                                  probabilities: list[CredentialProbabilities]) -> float:
+    """Success probability of a mechanism whose decision only depends on the count class"""
+    if all(p.to_vector() == probabilities[0].to_vector() for p in probabilities):
+        distribution = iid_class_probabilities(probabilities[0], len(probabilities))
+    else:
+        distribution = class_probabilities(probabilities)
+    return sum(probability for (counts, probability) in distribution.items() if decide(counts))
+
+def majority_success_probability(M: MajorityMechanism, probabilities: list[CredentialProbabilities]) -> float:
+    """
+    Success probability of a majority mechanism.
+
+    The user (safe and leaked credentials) and the attacker (theft and leaked credentials) compare counts, so
+    the user wins every class with more safe than stolen credentials and loses those with fewer, or with
+    neither. Classes with as many safe as stolen credentials (at least one) go to the tie breaker, which is
+    not symmetric: there, only the tie scenarios won by the user are enumerated, through the tie break table.
+    """
+    n = M.num_credentials
+    if len(probabilities) != n:
+        raise ValueError("Number of probabilities must match number of credentials")
+    symmetric = symmetric_success_probability(lambda counts: counts[St.SAFE.value] > counts[St.THEFT.value],
+                                              probabilities)
+    # Tie entries won by the user are (user_mask << n) | attacker_mask
+    won = np.flatnonzero(M.tie_break_table())
+    if len(won) == 0:
+        return symmetric
+    bits = 1 << np.arange(n, dtype=np.int64)
+    user = ((won[:, None] >> n) & bits) != 0
+    attacker = (won[:, None] & bits) != 0
+    states = np.where(user, np.where(attacker, St.LEAKED.value, St.SAFE.value),
+                      np.where(attacker, St.THEFT.value, St.LOST.value))
+    p = np.array([cp.to_vector() for cp in probabilities])
+    ties = np.prod(p[np.arange(n), states], axis=1).sum()
+    return symmetric + float(ties)
@@ -0,0 +1,288 @@
+"""
+Reduced ordered multi-valued decision diagrams (MDDs) over the four credential states.
+
+A profile lists every scenario won by the user, which is impossible past about 10 credentials.
+The judging functions of priority and majority mechanisms are sequential, however, and their
+diagrams stay small: each internal node tests one credential and has one child per `St` value,
+credentials are tested in the order 0, 1, ..., n-1, and the diagrams are reduced
+(no node has four identical children and no two nodes are identical).
+
+Diagrams are compiled from an automaton that reads the credential states one at a time:
+- `initial` is the state before reading any credential,
+- `step(credential, state, st)` returns the next state, or True/False once the outcome is decided,
+- `finish(state)` returns the outcome after all credentials are read.
+"""
+
+from typing import Callable, Hashable
+from maximal_mechanisms import Mechanism, MajorityMechanism, PriorityMechanism
+from mechanism_spec import SpecMechanism
+from scenarios import CredentialProbabilities, Profile, Scenario, St, generate_all_scenarios
+
+# Terminal node ids
+FALSE = 0 # Attacker wins
+TRUE = 1 # User wins
+
+class DecisionDiagram:
+    """
+    A reduced ordered multi-valued decision diagram deciding whether the user wins a scenario.
+
+    Attributes:
+        num_credentials (int): The number of credentials (variables) of the diagram.
+        nodes (list[tuple[int, tuple[int, ...]]]): For each node id, the credential it tests and its
+            four children (indexed by `St.value`). Nodes 0 and 1 are the FALSE and TRUE terminals,
+            whose "credential" is num_credentials. Children always have smaller ids than their parents.
+        root (int): The id of the root node.
+
+    Methods:
+        succeeds(scenario): Determines if the user wins the given scenario.
+        success_probability(probabilities): The probability that the user wins, in O(nodes).
+        count(): The number of scenarios won by the user, i.e., the size of the profile.
+        to_profile(): The explicit profile (only for small num_credentials).
+    """
+    def __init__(self, num_credentials: int):
+        self.num_credentials = num_credentials
+        self.nodes = [(num_credentials, None), (num_credentials, None)]
+        self.root = FALSE
+        self._unique = {}
+
+    def make_node(self, credential: int, children: tuple[int, ...]) -> int:
+        # Reduction rule 1: skip nodes whose outcome does not depend on the credential
+        if all(c == children[0] for c in children):
+            return children[0]
+        # Reduction rule 2: share identical nodes
+        key = (credential, children)
+        if key not in self._unique:
+            self._unique[key] = len(self.nodes)
+            self.nodes.append(key)
+        return self._unique[key]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return "DecisionDiagram(%s creds, %s nodes)" % (self.num_credentials, len(self))
+
+    def __eq__(self, other):
+        """
+        Two reduced ordered diagrams represent the same function iff they are isomorphic.
+        Note: unlike `Profile.__eq__`, credential permutations are not considered.
+        """
+        if not isinstance(other, DecisionDiagram):
+            return NotImplemented
+        if self.num_credentials != other.num_credentials:
+            return False
+        matched = {}
+        stack = [(self.root, other.root)]
+        while stack:
+            (a, b) = stack.pop()
+            if a in matched:
+                if matched[a] != b:
+                    return False
+                continue
+            matched[a] = b
+            if a <= TRUE or b <= TRUE:
+                if a != b:
+                    return False
+                continue
+            (credential_a, children_a) = self.nodes[a]
+            (credential_b, children_b) = other.nodes[b]
+            if credential_a != credential_b:
+                return False
+            stack.extend(zip(children_a, children_b))
+        return True
+
+    def succeeds(self, scenario: Scenario) -> bool:
+        node = self.root
+        while node > TRUE:
+            (credential, children) = self.nodes[node]
+            node = children[scenario.credential_states[credential].value]
+        return node == TRUE
+
+    def success_probability(self, probabilities: list[CredentialProbabilities]) -> float:
+        if len(probabilities) != self.num_credentials:
+            raise ValueError("Number of probabilities must match number of credentials")
+        # Skipped credentials don't matter since each credential's probabilities sum to 1
+        values = [0, 1]
+        for (credential, children) in self.nodes[2:]:
+            values.append(sum(probabilities[credential].get_probability(st) * values[children[st.value]]
+                              for st in St))
+        return values[self.root]
+
+    def count(self) -> int:
+        """The number of scenarios won by the user (exact, for any number of credentials)"""
+        counts = [0, 1]
+        for (credential, children) in self.nodes[2:]:
+            counts.append(sum(counts[c] * 4**(self.nodes[c][0] - credential - 1) for c in children))
+        return counts[self.root] * 4**self.nodes[self.root][0]
+
+    def to_profile(self) -> Profile:
+        all_scenarios = generate_all_scenarios(self.num_credentials)
+        return Profile([scenario for scenario in all_scenarios if self.succeeds(scenario)])
+
+def compile_automaton(num_credentials: int, initial: Hashable,
+                      step: Callable[[int, Hashable, St], Hashable],
+                      finish: Callable[[Hashable], bool]) -> DecisionDiagram:
+    """
+    Compiles a sequential automaton (see the module docstring) into a reduced decision diagram.
+    The work is proportional to the number of distinct (credential, state) pairs reached.
+    """
+    diagram = DecisionDiagram(num_credentials)
+    memo = {}
+
+    def build(credential, state):
+        if state is True or state is False:
+            return TRUE if state else FALSE
+        if credential == num_credentials:
+            return TRUE if finish(state) else FALSE
+        key = (credential, state)
+        if key not in memo:
+            children = tuple(build(credential + 1, step(credential, state, st)) for st in St)
+            memo[key] = diagram.make_node(credential, children)
+        return memo[key]
+
+    diagram.root = build(0, initial)
+    return diagram
+
+def priority_diagram(rule: list[int], exception: bool) -> DecisionDiagram:
+    """
+    Compiles `PriorityMechanism(rule, exception)` into a diagram with O(n^2) nodes.
+
+    The automaton remembers the highest-priority decisive (SAFE or THEFT) credential read so far,
+    and, for the exception, whether all of rule[:-2] are LOST along with the states of rule[-2] and rule[-1].
+    """
+    n = len(rule)
+    if exception and n < 2:
+        raise ValueError("Priority with exception needs at least two credentials")
+    rank = {credential: r for (r, credential) in enumerate(rule)}
+    # Highest priority (smallest rank) among the credentials not read yet
+    min_rank_from = [min([rank[c] for c in range(i, n)] + [n]) for i in range(n + 1)]
+    prefix = set(rule[:-2])
+
+    def step(credential, state, st):
+        (best_rank, outcome, exc) = state
+        if (st == St.SAFE or st == St.THEFT) and rank[credential] < best_rank:
+            (best_rank, outcome) = (rank[credential], st == St.SAFE)
+        if exc is not None:
+            if credential in prefix:
+                if st != St.LOST:
+                    exc = None
+            elif st != St.SAFE and st != St.THEFT:
+                exc = None
+            elif credential == rule[-2]:
+                exc = (st, exc[1])
+            else:
+                exc = (exc[0], st)
+        # The outcome is final if no unread credential has a higher priority
+        if exc is None and best_rank < min_rank_from[credential + 1]:
+            return outcome
+        return (best_rank, outcome, exc)
+
+    def finish(state):
+        (_, outcome, exc) = state
+        if exc == (St.SAFE, St.THEFT):
+            return False
+        if exc == (St.THEFT, St.SAFE):
+            return True
+        return outcome
+
+    return compile_automaton(n, (n, False, (None, None) if exception else None), step, finish)
+
+def uniform_priority_majority_diagram(num_credentials: int, rule: list[int]) -> DecisionDiagram:
+    """
+    Compiles the majority mechanism whose ties are broken by `uniform_priority_tie_breaker` with `rule`
+    into a diagram with O(n^3) nodes. The automaton remembers the difference between the user's and
+    the attacker's counts, and the highest-priority credential known to exactly one of them.
+    """
+    n = num_credentials
+    rank = {credential: r for (r, credential) in enumerate(rule)}
+
+    def step(credential, state, st):
+        (diff, best_rank, outcome) = state
+        # SAFE: known to the user only. THEFT: known to the attacker only.
+        if st == St.SAFE or st == St.THEFT:
+            diff = diff + 1 if st == St.SAFE else diff - 1
+            if rank[credential] < best_rank:
+                (best_rank, outcome) = (rank[credential], st == St.SAFE)
+        remaining = n - credential - 1
+        if abs(diff) > remaining:
+            return diff > 0
+        return (diff, best_rank, outcome)
+
+    def finish(state):
+        (diff, _, outcome) = state
+        return diff > 0 or (diff == 0 and outcome)
+
+    return compile_automaton(n, (0, n, False), step, finish)
+
+def majority_diagram(num_credentials: int,
+                     tie_breaker_func: Callable[[list[int], list[int]], bool]) -> DecisionDiagram:
+    """
+    Compiles a majority mechanism with an arbitrary tie breaker. The automaton has to remember the sets
+    of credentials known to the user and the attacker, so this is only practical for small n.
+    """
+    n = num_credentials
+
+    def step(credential, state, st):
+        (diff, user_credentials, attacker_credentials) = state
+        if st == St.SAFE or st == St.LEAKED:
+            user_credentials = user_credentials + (credential,)
+        if st == St.THEFT or st == St.LEAKED:
+            attacker_credentials = attacker_credentials + (credential,)
+        diff = len(user_credentials) - len(attacker_credentials)
+        if abs(diff) > n - credential - 1:
+            return diff > 0
+        return (diff, user_credentials, attacker_credentials)
+
+    def finish(state):
+        (diff, user_credentials, attacker_credentials) = state
+        if diff != 0:
+            return diff > 0
+        if user_credentials == attacker_credentials: # Both submit same credentials!
+            return False
+        return tie_breaker_func(list(user_credentials), list(attacker_credentials))
+
+    return compile_automaton(n, (0, (), ()), step, finish)
+
+def scenario_diagram(num_credentials: int, succeeds: Callable[[Scenario], bool]) -> DecisionDiagram:
+    """Compiles any judging function by enumerating all 4^n scenarios (only for small n)"""
+    def step(credential, state, st):
+        return state + (st,)
+
+    def finish(state):
+        return succeeds(Scenario(list(state)))
+
+    return compile_automaton(num_credentials, (), step, finish)
+
+def spec_diagram(M: SpecMechanism) -> DecisionDiagram:
+    """
+    Compiles a declarative mechanism. The automaton remembers which rules may still apply, and stops
+    as soon as the first of them has no conditions left or none remains.
+    """
+    allowed = M.allowed_states()
+    outcomes = [outcome for (_, outcome) in M.rules]
+    # Last credential each rule constrains (-1 if none)
+    last = [max(conditions, default=-1) for (conditions, _) in M.rules]
+
+    def decide(credential, state):
+        if len(state) == 0:
+            return M.default
+        if last[state[0]] <= credential:
+            return outcomes[state[0]]
+        return state
+
+    def step(credential, state, st):
+        return decide(credential, tuple(r for r in state if allowed[r, credential, st.value]))
+
+    def finish(state):
+        return outcomes[state[0]]
+
+    return compile_automaton(M.num_credentials, decide(-1, tuple(range(len(M.rules)))), step, finish)
+
+def compile_mechanism(M: Mechanism) -> DecisionDiagram:
+    if isinstance(M, PriorityMechanism):
+        return priority_diagram(M.rule, M.exception)
+    if isinstance(M, MajorityMechanism):
+        return majority_diagram(M.num_credentials, M.tie_breaker_func)
+    if isinstance(M, SpecMechanism):
+        return spec_diagram(M)
+    return scenario_diagram(M.num_credentials, M.succeeds)
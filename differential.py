@@ -0,0 +1,229 @@
+"""
+Randomized differential testing of the fast evaluation engines against the reference implementation.
+
+The reference semantics are the scenario-by-scenario ones: a mechanism's profile is the list of scenarios of
+`generate_all_scenarios(n)` for which `succeeds` holds, its success probability is `Profile.success_probability`,
+and two mechanisms are the same if their profiles are equal up to a credential permutation (`Profile.__eq__`).
+
+Cases are plain data (so that they can be printed, replayed and shrunk): a mechanism kind with its parameters,
+and the probabilities of every credential, drawn from a grid with multiples of 1/8 (including point masses,
+so that zero-probability states are exercised). Every engine is compared with the reference: profiles must be
+identical, and success probabilities equal up to `TOLERANCE` (the engines add the same terms in other orders).
+A failing case is shrunk greedily to a simpler failing case.
+"""
+
+import random
+import time
+import numpy as np
+from count_classes import majority_success_probability
+from decision_diagrams import compile_mechanism
+from maximal_mechanisms import MajorityMechanism, Mechanism, PriorityMechanism, WeightedMechanism
+from mechanism_spec import SpecMechanism
+from scenarios import CredentialProbabilities, Profile, St, generate_all_scenarios, scenario_probability_matrix
+from sensitivity import success_probability_gradients
+from support import support_success_probability
+from tie_break_orbits import label_tie_breaker, signed_permutations
+
+TOLERANCE = 1e-12
+
+STATE_NAMES = [st.name.lower() for st in St]
+
+def random_probabilities(rng: random.Random) -> tuple[float, ...]:
+    if rng.random() < 0.2:
+        point = [0.0] * 4
+        point[rng.randrange(4)] = 1.0
+        return tuple(point)
+    a = rng.randint(0, 8)
+    b = rng.randint(0, 8 - a)
+    c = rng.randint(0, 8 - a - b)
+    return (a / 8, b / 8, c / 8, (8 - a - b - c) / 8)
+
+def random_case(rng: random.Random, num_credentials: int) -> dict:
+    n = num_credentials
+    kind = rng.choice(["priority", "majority", "weighted", "spec"])
+    rule = list(range(n))
+    rng.shuffle(rule)
+    if kind == "priority":
+        params = {"rule": rule, "exception": rng.random() < 0.5}
+    elif kind == "majority":
+        num_inputs = MajorityMechanism.number_of_tie_breaks(n)
+        params = {"label": [rng.randint(0, 1) for _ in range(num_inputs)]}
+    elif kind == "weighted":
+        params = {"weights": [rng.randint(0, 4) for _ in range(n)], "rule": rule}
+    else:
+        rules = []
+        for _ in range(rng.randint(0, 4)):
+            conditions = {str(k): rng.sample(STATE_NAMES, rng.randint(1, 3)) for k in rng.sample(range(n), rng.randint(1, n))}
+            rules.append({"if": conditions, "then": rng.random() < 0.5})
+        params = {"num_credentials": n, "rules": rules, "default": rng.random() < 0.5}
+    return {"kind": kind, "num_credentials": n, "params": params,
+            "probabilities": [random_probabilities(rng) for _ in range(n)]}
+
+def build_mechanism(case: dict) -> Mechanism:
+    (kind, n, params) = (case["kind"], case["num_credentials"], case["params"])
+    if kind == "priority":
+        return PriorityMechanism(list(params["rule"]), params["exception"])
+    if kind == "majority":
+        return MajorityMechanism(n, label_tie_breaker(n, params["label"]), list(params["label"]),
+                                 label_defines_tie_breaker=True)
+    if kind == "weighted":
+        return WeightedMechanism(list(params["weights"]), list(params["rule"]))
+    return SpecMechanism(params)
+
+def case_probabilities(case: dict) -> list[CredentialProbabilities]:
+    return [CredentialProbabilities(*p) for p in case["probabilities"]]
+
+def reference_profile(M: Mechanism) -> Profile:
+    return Profile([s for s in generate_all_scenarios(M.num_credentials) if M.succeeds(s)])
+
+def _engines(case: dict) -> dict:
+    """The fast engines applicable to the case: name -> function(M, probabilities) returning a profile bitmask or a probability"""
+    engines = {
+        "succeeds_batch": lambda M, p: M.profile_bitmask(),
+        "diagram_profile": lambda M, p: compile_mechanism(M).to_profile().bitmask(),
+        "diagram_probability": lambda M, p: compile_mechanism(M).success_probability(p),
+        "matrix_probability": lambda M, p: float(scenario_probability_matrix(np.array([[cp.to_vector() for cp in p]]))[0]
+                                                 @ M.profile_indicator()),
+        "support_probability": support_success_probability,
+        "gradient_probability": lambda M, p: float(success_probability_gradients([M], p)[0][0]),
+    }
+    if case["kind"] == "majority":
+        engines["count_classes_probability"] = majority_success_probability
+    if case["kind"] == "weighted":
+        engines["dynamic_program_probability"] = lambda M, p: M.success_probability(p)
+    return engines
+
+def check_case(case: dict, timings: dict = None) -> list[str]:
+    """
+    Returns the names of the engines that disagree with the reference on the case. If timings is given, the time
+    spent in every engine (and "reference") is added to it, along with the number of evaluations.
+    """
+    probabilities = case_probabilities(case)
+    start = time.perf_counter()
+    reference = reference_profile(build_mechanism(case))
+    reference_bitmask = reference.bitmask()
+    reference_value = reference.success_probability(probabilities)
+    if timings is not None:
+        _record(timings, "reference", time.perf_counter() - start)
+    failures = []
+    for (name, engine) in _engines(case).items():
+        M = build_mechanism(case) # Fresh, so that no engine reuses the work of another
+        start = time.perf_counter()
+        try:
+            result = engine(M, probabilities)
+        except Exception:
+            failures.append(name)
+            continue
+        if timings is not None:
+            _record(timings, name, time.perf_counter() - start)
+        expected = reference_value if name.endswith("probability") else reference_bitmask
+        if abs(result - expected) > (TOLERANCE if name.endswith("probability") else 0):
+            failures.append(name)
+    return failures
+
+def _record(timings: dict, name: str, seconds: float):
+    (total, count) = timings.get(name, (0.0, 0))
+    timings[name] = (total + seconds, count + 1)
+
+def check_dedup(rng: random.Random, num_credentials: int) -> bool:
+    """
+    Compares tie break orbits (the fast dedup of majority mechanisms) with Profile.__eq__: a random label and
+    either a random image of it under a credential permutation or an independent random label.
+    Returns whether they agree.
+    """
+    n = num_credentials
+    actions = signed_permutations(n)
+    label = [rng.randint(0, 1) for _ in range(len(actions[0]))]
+    if rng.random() < 0.5:
+        action = rng.choice(actions)
+        other = [0] * len(label)
+        for (j, (image, flip)) in enumerate(action):
+            other[image] = label[j] ^ flip
+    else:
+        other = [rng.randint(0, 1) for _ in range(len(label))]
+    images = set()
+    for action in actions:
+        image = [0] * len(label)
+        for (j, (k, flip)) in enumerate(action):
+            image[k] = label[j] ^ flip
+        images.add(tuple(image))
+    same_orbit = tuple(other) in images
+    profiles = [reference_profile(MajorityMechanism(n, label_tie_breaker(n, l), l)) for l in [label, other]]
+    return same_orbit == (profiles[0] == profiles[1])
+
+# Probabilities that shrinking tries, simplest first
+SIMPLE_PROBABILITIES = [(0.0, 0.0, 0.0, 1.0), (1.0, 0.0, 0.0, 0.0), (0.25, 0.25, 0.25, 0.25)]
+
+def _shrink_candidates(case: dict):
+    n = case["num_credentials"]
+    params = case["params"]
+    for k in range(n):
+        current = tuple(case["probabilities"][k])
+        rank = SIMPLE_PROBABILITIES.index(current) if current in SIMPLE_PROBABILITIES else len(SIMPLE_PROBABILITIES)
+        for simpler in SIMPLE_PROBABILITIES[:rank]:
+            yield dict(case, probabilities=case["probabilities"][:k] + [simpler] + case["probabilities"][k + 1:])
+    if case["kind"] in ["priority", "weighted"]:
+        if params["rule"] != sorted(params["rule"]):
+            yield dict(case, params=dict(params, rule=sorted(params["rule"])))
+        if n > 2:
+            # Drop the last credential
+            smaller = dict(params, rule=[x for x in params["rule"] if x != n - 1])
+            if case["kind"] == "weighted":
+                smaller["weights"] = params["weights"][:-1]
+            yield dict(case, num_credentials=n - 1, params=smaller, probabilities=case["probabilities"][:-1])
+    if case["kind"] == "priority" and params["exception"]:
+        yield dict(case, params=dict(params, exception=False))
+    if case["kind"] == "majority":
+        for j in range(len(params["label"])):
+            if params["label"][j] == 1:
+                yield dict(case, params=dict(params, label=params["label"][:j] + [0] + params["label"][j + 1:]))
+    if case["kind"] == "weighted":
+        for k in range(n):
+            if params["weights"][k] > 0:
+                weights = list(params["weights"])
+                weights[k] -= 1
+                yield dict(case, params=dict(params, weights=weights))
+    if case["kind"] == "spec":
+        for r in range(len(params["rules"])):
+            yield dict(case, params=dict(params, rules=params["rules"][:r] + params["rules"][r + 1:]))
+        if params["default"]:
+            yield dict(case, params=dict(params, default=False))
+
+def shrink_case(case: dict, check=check_case) -> dict:
+    """Greedily replaces the case by simpler ones on which the same engines still fail"""
+    failures = set(check(case))
+    shrinking = True
+    while shrinking:
+        shrinking = False
+        for candidate in _shrink_candidates(case):
+            if failures & set(check(candidate)):
+                (case, shrinking) = (candidate, True)
+                break
+    return case
+
+def run_differential(num_cases: int = 100, num_credentials: range = range(2, 8), seed: int = 0,
+                     dedup_credentials: range = range(2, 5)) -> dict:
+    """
+    Runs random cases and dedup checks, and returns a report with the shrunk failing cases (with the engines that
+    fail on them), the dedup disagreements, and the throughput (evaluations per second) of every engine.
+    """
+    rng = random.Random(seed)
+    timings = {}
+    failures = []
+    for i in range(num_cases):
+        case = random_case(rng, num_credentials[i % len(num_credentials)])
+        failed = check_case(case, timings)
+        if failed:
+            failures.append((shrink_case(case), failed))
+    dedup_failures = [n for n in dedup_credentials for _ in range(10) if not check_dedup(rng, n)]
+    throughput = {name: count / seconds if seconds > 0 else float("inf")
+                  for (name, (seconds, count)) in timings.items()}
+    return {"cases": num_cases, "failures": failures, "dedup_failures": dedup_failures, "throughput": throughput}
+
+if __name__ == '__main__':
+    report = run_differential()
+    print("Cases:", report["cases"])
+    print("Failures:", report["failures"])
+    print("Dedup failures:", report["dedup_failures"])
+    for (name, rate) in sorted(report["throughput"].items(), key=lambda item: item[1]):
+        print("%-28s %10.1f evaluations/s" % (name, rate))
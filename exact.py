@@ -0,0 +1,135 @@
+"""
+Exact scoring with integer arithmetic.
+
+Float success probabilities depend on the summation order, so `==` can split genuine ties or merge near ones.
+Here, each credential's probabilities are read as the decimals they were written as (Fraction(repr(p)), or the
+Fractions themselves), and scaled to integers n_k[st] over a denominator D_k = sum(n_k). The probability of a
+scenario is then prod_k n_k[s_k] / D with the common denominator D = prod_k D_k, and a mechanism's success
+probability is an integer numerator over D, so scores compare exactly.
+
+CredentialProbabilities rejects probabilities whose float sum is not exactly 1, such as (0.7, 0.1, 0.1, 0.1), so
+the probabilities of a credential can also be given as a plain tuple, whose sum is checked on the exact values.
+
+If D < 2^63, every numerator (at most D) fits in int64 and scoring is one integer matrix product. Otherwise (e.g.,
+two credentials with a probability of 1/3, read as 3333333333333333/10^16), the scenario numerators are Python
+integers, split into limbs of 53 - 2n bits whose sums are exact in float64, and all limbs are scored with one float
+matrix product.
+"""
+
+import math
+import numbers
+from fractions import Fraction
+import numpy as np
+from maximal_mechanisms import Mechanism, profile_matrix
+from scenarios import CredentialProbabilities, St
+
+def exact_probability(p) -> Fraction:
+    if isinstance(p, (numbers.Rational, str)):
+        return Fraction(p)
+    # float(p) for NumPy floats, whose repr includes the type name
+    return Fraction(repr(float(p)))
+
+def exact_credential_probabilities(probabilities) -> list[Fraction]:
+    """
+    Returns the exact probabilities of a credential, indexed by St.value. They are given as CredentialProbabilities,
+    or as a (theft, leaked, lost, safe) tuple of decimals (floats or strings) or Fractions. Tuples are checked on
+    their exact values, so e.g. (0.7, 0.1, 0.1, 0.1) is accepted although its float sum is not 1.
+    """
+    if isinstance(probabilities, CredentialProbabilities):
+        return [exact_probability(probabilities.get_probability(st)) for st in St]
+    fractions = [exact_probability(p) for p in probabilities]
+    if len(fractions) != len(St):
+        raise ValueError("Expected %s probabilities, got %s" % (len(St), len(fractions)))
+    if not all(0 <= f <= 1 for f in fractions):
+        raise ValueError("Probabilities must be between 0 and 1.")
+    if sum(fractions) != 1:
+        raise ValueError("Probabilities must sum to 1.")
+    return fractions
+
+def integer_probabilities(probabilities: list) -> tuple[list[list[int]], int]:
+    """
+    Args:
+        probabilities (list): The probabilities of every credential (see exact_credential_probabilities).
+
+    Returns:
+        tuple: For each credential, its integer weights indexed by St.value, and the common denominator
+        (the product of the credentials' weight sums)
+    """
+    numerators = []
+    denominator = 1
+    for cp in probabilities:
+        fractions = exact_credential_probabilities(cp)
+        scale = math.lcm(*(f.denominator for f in fractions))
+        weights = [int(f * scale) for f in fractions]
+        numerators.append(weights)
+        denominator *= sum(weights)
+    return (numerators, denominator)
+
+class ExactScorer:
+    """
+    Exact scoring of a fixed list of mechanisms, whose profiles are converted to an integer matrix once.
+    The probabilities of every credential are CredentialProbabilities or exact tuples (see
+    exact_credential_probabilities).
+
+    Attributes:
+        mechanisms (list[Mechanism]): The mechanisms to score.
+
+    Methods:
+        success_probabilities(probabilities): The success probability numerators of the mechanisms (int64, or Python
+            ints if the denominator is 2^63 or more) and their common denominator.
+        tie_groups(probabilities): The mechanisms grouped by exactly equal success probability, as (Fraction, mechanisms)
+            pairs from the highest success probability to the lowest.
+        find_best_mechanisms(probabilities): Like `find_best_mechanisms`, with ties decided exactly. The success
+            probability is a Fraction.
+    """
+    def __init__(self, mechanisms: list[Mechanism]):
+        self.mechanisms = list(mechanisms)
+        profiles = profile_matrix(self.mechanisms)
+        self._profiles = profiles.astype(np.int64)
+        self._float_profiles = profiles.astype(np.float64)
+
+    def success_probabilities(self, probabilities: list) -> tuple[np.ndarray, int]:
+        n = len(probabilities)
+        if any(M.num_credentials != n for M in self.mechanisms):
+            raise ValueError("Number of probabilities must match number of credentials")
+        (numerators, denominator) = integer_probabilities(probabilities)
+        dtype = np.int64 if denominator < 2**63 else object
+        # As in scenario_probability_matrix: credential 0 is the least significant digit of the scenario index
+        scenario_numerators = np.array(numerators[n - 1], dtype=dtype)
+        for i in range(n - 2, -1, -1):
+            scenario_numerators = (scenario_numerators[:, None] * np.array(numerators[i], dtype=dtype)[None, :]).reshape(-1)
+        if dtype is np.int64:
+            return (scenario_numerators @ self._profiles, denominator)
+        # Split the numerators into limbs of `bits` bits, small enough that every partial sum of 4^n limbs is an
+        # integer below 2^53, i.e., exact in float64. All limbs are then scored with one (BLAS) float matrix product,
+        # and the sums are recombined with Python ints.
+        bits = 53 - 2 * n
+        mask = (1 << bits) - 1
+        shifts = range(0, denominator.bit_length(), bits)
+        limbs = np.array([((scenario_numerators >> shift) & mask).astype(np.float64) for shift in shifts])
+        sums = (limbs @ self._float_profiles).astype(np.int64)
+        values = np.zeros(len(self.mechanisms), dtype=object)
+        for (shift, row) in zip(shifts, sums):
+            values += row.astype(object) << shift
+        return (values, denominator)
+
+    def tie_groups(self, probabilities: list) -> list[tuple]:
+        (values, denominator) = self.success_probabilities(probabilities)
+        groups = {}
+        for (M, value) in zip(self.mechanisms, values):
+            groups.setdefault(int(value), []).append(M)
+        return [(Fraction(value, denominator), groups[value]) for value in sorted(groups, reverse=True)]
+
+    def find_best_mechanisms(self, probabilities: list):
+        (best_value, best_mechanisms) = self.tie_groups(probabilities)[0]
+        return (best_mechanisms, best_value)
+
+def exact_success_probabilities(mechanisms: list[Mechanism], probabilities: list) -> tuple[np.ndarray, int]:
+    return ExactScorer(mechanisms).success_probabilities(probabilities)
+
+def find_best_mechanisms_exact(probabilities: list, mechanisms: list[Mechanism]):
+    """
+    Returns:
+        tuple: A tuple containing the best mechanisms and their success probability, as a Fraction
+    """
+    return ExactScorer(mechanisms).find_best_mechanisms(probabilities)
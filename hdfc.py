@@ -1,22 +1,24 @@
 # HDFC bank analysis below
 
-from scenarios import CredentialProbabilities, Profile, St, generate_all_scenarios
+from mechanism_spec import SpecMechanism
+from scenarios import CredentialProbabilities, Profile
 from three_credentials import find_best_mechanisms
 
+# Credentials: 0 is the password, 1 is the mobile (OTP) and 2 is the ID.
+# The user wins if the mobile is safe, or if it is lost and the ID is safe.
+HDFC_SPEC = {
+    "name": "HDFC Bank",
+    "num_credentials": 3,
+    "rules": [
+        {"if": {1: "safe"}, "then": True},
+        {"if": {1: "lost", 2: "safe"}, "then": True},
+    ],
+    "default": False,
+}
 
-def get_existing_profile():
+def get_existing_profile() -> Profile:
     """The profile the current HDFC Bank mechanism"""
-    all_scenarios = generate_all_scenarios(3)
-    profile = []
-    # Add all scenarios where mobile is safe
-    for scenario in all_scenarios:
-        if scenario.credential_states[1] == St.SAFE:
-            profile.append(scenario)
-        elif scenario.credential_states[1] == St.LOST and scenario.credential_states[2] == St.SAFE:
-            profile.append(scenario)
-    if len(profile) != 20:
-        raise Exception("Error: Incorrect number of scenarios in profile")
-    return Profile(profile)
+    return SpecMechanism(HDFC_SPEC).profile
 
 # Sample credential probabilities to conduct our analysis...
 # P(theft) = 0, P(leaked) = 0.15, P(lost) = 0.15, P(safe) = 0.7
@@ -0,0 +1,87 @@
+"""
+Incremental re-scoring of mechanisms for what-if analysis (e.g., `hdfc.py`).
+
+The success probability of a mechanism is multilinear in the state probabilities of each credential.
+Fixing a credential k, it can be written as
+
+    P(M) = sum_{st in St} p_k(st) * A(M, k, st)
+
+where A(M, k, st) sums, over the scenarios of prof(M) in which credential k is in state st,
+the product of the probabilities of all the *other* credentials. The partial sums A(M, k, .) do
+not depend on p_k, so after they are computed once, changing credential k's probabilities
+rescores every mechanism in O(M * 4) instead of O(M * 4^n).
+"""
+
+from maximal_mechanisms import Mechanism
+from scenarios import CredentialProbabilities, St
+from utils import best_with_ties
+
+class IncrementalScorer:
+    """
+    Scores a fixed list of mechanisms and updates the scores as credential probabilities change.
+
+    Attributes:
+        mechanisms (list[Mechanism]): The mechanisms being scored. They must all have the same number of credentials.
+        probabilities (list[CredentialProbabilities]): The current credential probabilities.
+
+    Methods:
+        partial_sums(credential): Per-mechanism partial sums factored by the given credential.
+        scores(): The success probability of every mechanism under the current probabilities.
+        update(credential, credential_probabilities): Changes one credential's probabilities and returns the new scores.
+        best_mechanisms(): The best mechanisms and their success probability, like `find_best_mechanisms`.
+    """
+    def __init__(self, mechanisms: list[Mechanism], probabilities: list[CredentialProbabilities]):
+        for M in mechanisms:
+            if M.num_credentials != len(probabilities):
+                raise ValueError("Number of probabilities must match number of credentials")
+        self.mechanisms = mechanisms
+        self.probabilities = list(probabilities)
+        # credential index -> one list of 4 partial sums (indexed by St.value) per mechanism
+        self._partial_sums = {}
+
+    def partial_sums(self, credential: int) -> list[list[float]]:
+        """
+        Returns, for every mechanism, the 4 partial sums A(M, credential, st) indexed by `st.value`.
+        Computed with a full pass over the profiles the first time, cached afterwards.
+        """
+        if credential not in self._partial_sums:
+            self._partial_sums[credential] = [self._compute_partial_sums(M, credential) for M in self.mechanisms]
+        return self._partial_sums[credential]
+
+    def _compute_partial_sums(self, M: Mechanism, credential: int) -> list[float]:
+        sums = [0] * len(St)
+        for scenario in M.profile:
+            probability = 1
+            for i, state in enumerate(scenario.credential_states):
+                if i != credential:
+                    probability *= self.probabilities[i].get_probability(state)
+            sums[scenario.credential_states[credential].value] += probability
+        return sums
+
+    def scores(self) -> list[float]:
+        # Any cached factorization gives the scores in O(M * 4)
+        credential = next(iter(self._partial_sums), 0)
+        credential_probabilities = self.probabilities[credential]
+        return [sum(credential_probabilities.get_probability(st) * sums[st.value] for st in St)
+                for sums in self.partial_sums(credential)]
+
+    def update(self, credential: int, credential_probabilities: CredentialProbabilities) -> list[float]:
+        """
+        Replaces the probabilities of one credential and returns the updated scores.
+
+        The partial sums factored by `credential` stay valid, whereas those factored by any other
+        credential depend on the old probabilities and are dropped.
+        """
+        if not 0 <= credential < len(self.probabilities):
+            raise ValueError("Credential %s does not exist" % (credential,))
+        partial_sums = self.partial_sums(credential)
+        self.probabilities[credential] = credential_probabilities
+        self._partial_sums = {credential: partial_sums}
+        return self.scores()
+
+    def best_mechanisms(self):
+        """
+        Returns:
+            tuple: A tuple containing the best mechanisms and their success probability
+        """
+        return best_with_ties(self.mechanisms, self.scores())
@@ -0,0 +1,131 @@
+"""
+Precomputed best-mechanism lookup table for three credentials.
+
+Each credential's probabilities are quantized to the simplex grid {(a, b, c, d) / q : a + b + c + d = q},
+which has N = (q+3 choose 3) points. An offline builder evaluates the deduplicated maximal set at every
+one of the N^3 grid cells and stores the index of the winning mechanism (one byte per cell) in a
+memory-mappable file. At login time, a query rounds the probabilities to the nearest cell and reads the
+winner in O(1). Near region boundaries, where the neighbouring cells have different winners,
+the query can optionally recheck these candidates exactly.
+
+File format: the magic bytes, a 4-byte little-endian header length, a JSON header (resolution, labels of
+the mechanisms, number of grid points), padding to a multiple of 64 bytes, then the N x N x N uint8 table.
+"""
+
+import itertools
+import json
+import math
+import numpy as np
+from maximal_mechanisms import Mechanism, profile_matrix
+from scenarios import CredentialProbabilities
+
+MAGIC = b"MECHLUT1"
+
+def simplex_grid(resolution: int) -> np.ndarray:
+    """The (N, 4) array of grid points, in lexicographic order of (theft, leaked, lost) counts"""
+    points = [(a, b, c, resolution - a - b - c)
+              for a in range(resolution + 1) for b in range(resolution + 1 - a) for c in range(resolution + 1 - a - b)]
+    return np.array(points, dtype=np.float64) / resolution
+
+def _grid_ranks(resolution: int) -> np.ndarray:
+    """ranks[a, b, c] is the index in simplex_grid of the point (a, b, c, q - a - b - c) / q"""
+    ranks = np.full((resolution + 1,) * 3, -1, dtype=np.int32)
+    rank = 0
+    for a in range(resolution + 1):
+        for b in range(resolution + 1 - a):
+            for c in range(resolution + 1 - a - b):
+                ranks[a, b, c] = rank
+                rank += 1
+    return ranks
+
+def quantize(probabilities: CredentialProbabilities, resolution: int) -> tuple[int, ...]:
+    """Rounds the probabilities to counts out of `resolution` summing to `resolution` (largest remainders first)"""
+    scaled = [p * resolution for p in probabilities.to_vector()]
+    counts = [math.floor(x) for x in scaled]
+    by_remainder = sorted(range(4), key=lambda i: counts[i] - scaled[i])
+    for i in by_remainder[:resolution - sum(counts)]:
+        counts[i] += 1
+    return tuple(counts)
+
+def build_lookup_table(path: str, mechanisms: list[Mechanism], resolution: int = 8):
+    """
+    Evaluates the mechanisms on every cell of the grid and writes the winners to `path`.
+    Ties go to the mechanism listed first.
+
+    The success probability is multilinear, so for a fixed first credential the scores of all
+    (second, third) credential pairs are one contraction of the profile tensor with the grid.
+    """
+    if any(M.num_credentials != 3 for M in mechanisms):
+        raise ValueError("The lookup table is only supported for three credentials")
+    if len(mechanisms) > 256:
+        raise ValueError("At most 256 mechanisms can be stored")
+    grid = simplex_grid(resolution)
+    N = len(grid)
+    # profiles[s2, s1, s0, m]: credential 0 is the least significant digit of the scenario index
+    profiles = profile_matrix(mechanisms).reshape(4, 4, 4, len(mechanisms))
+    header = json.dumps({"resolution": resolution, "num_points": N,
+                         "labels": [M.label() for M in mechanisms]}).encode()
+    offset = len(MAGIC) + 4 + len(header)
+    padding = -offset % 64
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        f.write(b"\0" * padding)
+        for i0 in range(N):
+            partial = np.einsum("cbam,a->cbm", profiles, grid[i0])
+            scores = np.einsum("jb,kc,cbm->jkm", grid, grid, partial)
+            f.write(np.argmax(scores, axis=2).astype(np.uint8).tobytes())
+
+class MechanismLookupTable:
+    """
+    Read-only access to a table written by build_lookup_table.
+
+    Attributes:
+        mechanisms (list[Mechanism]): The mechanisms the table refers to, in the order used to build it.
+        resolution (int): The grid resolution q.
+        winners (np.memmap): The (N, N, N) table of winning mechanism indices.
+    """
+    def __init__(self, path: str, mechanisms: list[Mechanism]):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a mechanism lookup table" % (path,))
+            header_length = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(header_length))
+        if header["labels"] != [M.label() for M in mechanisms]:
+            raise ValueError("The mechanisms do not match the ones used to build the table")
+        self.mechanisms = mechanisms
+        self.resolution = header["resolution"]
+        N = header["num_points"]
+        offset = len(MAGIC) + 4 + header_length
+        offset += -offset % 64
+        self.winners = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(N, N, N))
+        self._ranks = _grid_ranks(self.resolution)
+
+    def _cell(self, counts: list[tuple[int, ...]]) -> tuple[int, ...]:
+        return tuple(int(self._ranks[c[0], c[1], c[2]]) for c in counts)
+
+    def best_mechanism(self, probabilities: list[CredentialProbabilities], recheck: bool = False) -> Mechanism:
+        """
+        Returns the winner of the grid cell nearest to the probabilities.
+
+        With recheck, if the cells one step away (moving 1/q of probability between two states of one
+        credential) have other winners, these candidates are compared exactly with the given probabilities.
+        """
+        if len(probabilities) != 3:
+            raise ValueError("Number of probabilities must match number of credentials")
+        counts = [quantize(p, self.resolution) for p in probabilities]
+        winner = int(self.winners[self._cell(counts)])
+        if not recheck:
+            return self.mechanisms[winner]
+        candidates = {winner}
+        for (k, src, dst) in itertools.product(range(3), range(4), range(4)):
+            if src != dst and counts[k][src] > 0:
+                moved = list(counts[k])
+                moved[src] -= 1
+                moved[dst] += 1
+                neighbour = counts[:k] + [tuple(moved)] + counts[k + 1:]
+                candidates.add(int(self.winners[self._cell(neighbour)]))
+        if len(candidates) == 1:
+            return self.mechanisms[winner]
+        return max((self.mechanisms[i] for i in sorted(candidates)), key=lambda M: M.success_probability(probabilities))
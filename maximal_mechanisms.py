@@ -1,11 +1,18 @@
 """
-This module defines abstract base classes and specific implementations for priority and majority mechanisms.
+This module defines abstract base classes and specific implementations for priority, majority and weighted mechanisms.
 """
 
 import itertools
 import math
 from typing import Callable
-from scenarios import CredentialProbabilities, Profile, St, generate_all_scenarios
+import numpy as np
+from scenarios import (ALL_SCENARIOS, CredentialProbabilities, Profile, Scenario, St, generate_all_scenarios, scenario_blocks,
+                       scenario_state_array)
+from utils import LRUCache
+
+# Profiles shared by identical mechanisms (same cache_key), e.g., majority mechanisms with the same tie-break label.
+# Profiles in the cache must not be modified.
+PROFILE_CACHE = LRUCache(maxsize=256)
 
 # An abstract base class for mechanisms
 class Mechanism:
@@ -14,20 +21,45 @@ class Mechanism:
 
     Attributes:
         num_credentials (int): The number of credentials involved in the mechanism.
-        profile (Profile): The profile (scenarios where the mechanism succeeds).
+        profile (Profile): The profile (scenarios where the mechanism succeeds). Computed on first access.
 
     Methods:
         __repr__(): Returns a string representation of the Mechanism instance.
         succeeds(scenario): Determines if the mechanism succeeds for a given scenario.
+        cache_key(): A hashable key identifying the mechanism's judging function, or None if it has none.
+        succeeds_batch(states): Determines if the mechanism succeeds for each row of a scenarios x credentials array.
+        profile_bitmask(): The profile as an int with one bit per scenario.
+        profile_indicator(): The profile as a boolean array with one entry per scenario.
     """
     def __init__(self, num_credentials):
         self.num_credentials = num_credentials
-        self.profile = self.compute_profile()
-        pass
+        self._profile = None
+
+    # Enumerating all 4^n scenarios is expensive, so it is only done if the profile is needed,
+    # and only once for all mechanisms with the same cache_key
+    @property
+    def profile(self) -> Profile:
+        if self._profile is None:
+            key = self.cache_key()
+            if key is not None:
+                self._profile = PROFILE_CACHE.get(key)
+            if self._profile is None:
+                self._profile = self.compute_profile()
+                if key is not None:
+                    PROFILE_CACHE.put(key, self._profile)
+        return self._profile
+
+    def cache_key(self):
+        return None
 
     def succeeds(self, scenario) -> bool:
         pass
 
+    # states is a (num_scenarios, num_credentials) array of St values (see scenario_state_array).
+    # Subclasses override this with array operations; by default, it calls succeeds row by row.
+    def succeeds_batch(self, states: np.ndarray) -> np.ndarray:
+        return np.array([self.succeeds(Scenario([St(int(v)) for v in row])) for row in states], dtype=bool)
+
     def label(self) -> str:
         pass
 
@@ -36,7 +68,29 @@ class Mechanism:
 
     def compute_profile(self) -> Profile:
         all_scenarios = generate_all_scenarios(self.num_credentials)
-        return Profile([scenario for scenario in all_scenarios if self.succeeds(scenario)])
+        wins = self.succeeds_batch(scenario_state_array(self.num_credentials))
+        return Profile([all_scenarios[i] for i in np.flatnonzero(wins)])
+
+    # The profile as a bitmask (see Profile.bitmask), without building the Profile if it isn't there yet
+    def profile_bitmask(self) -> int:
+        if self._profile is not None:
+            return self._profile.bitmask()
+        return int.from_bytes(np.packbits(self.profile_indicator(), bitorder="little").tobytes(), "little")
+
+    # The profile as a boolean array with one entry per scenario of generate_all_scenarios(n)
+    def profile_indicator(self) -> np.ndarray:
+        if self._profile is not None:
+            indicator = np.zeros(4**self.num_credentials, dtype=bool)
+            indicator[[scenario.index() for scenario in self._profile]] = True
+            return indicator
+        n = self.num_credentials
+        if n <= len(ALL_SCENARIOS):
+            return self.succeeds_batch(scenario_state_array(n))
+        # Past the listable sizes, the state array would be too large to cache: judge it block by block
+        indicator = np.empty(4**n, dtype=bool)
+        for (indices, states) in scenario_blocks(n):
+            indicator[indices[0]:indices[-1] + 1] = self.succeeds_batch(states)
+        return indicator
 
     def __eq__(self, other):
         return self.profile == other.profile
@@ -44,6 +98,15 @@ class Mechanism:
     def success_probability(self, probabilities: list[CredentialProbabilities]) -> float:
         return self.profile.success_probability(probabilities)
 
+def profile_matrix(mechanisms: list[Mechanism]) -> np.ndarray:
+    """
+    Returns a (4^n, len(mechanisms)) float matrix whose column j is the profile indicator of mechanisms[j],
+    so that scenario probabilities (see scenario_probability_matrix) times it gives success probabilities.
+    """
+    if len(set(M.num_credentials for M in mechanisms)) > 1:
+        raise ValueError("All mechanisms must have the same number of credentials")
+    return np.stack([M.profile_indicator() for M in mechanisms], axis=1).astype(np.float64)
+
 # Models both priority and priority with exception mechanisms
 class PriorityMechanism(Mechanism):
     """
@@ -56,6 +119,7 @@ class PriorityMechanism(Mechanism):
         is_rule_well_defined(): Checks if the rule is well-defined. A rule is well-defined if it is a permutation of [0, 1, 2, ..., len(rule) - 1].
         __repr__(): Returns a string representation of the PriorityMechanism, indicating the rule and whether an exception applies.
         succeeds(scenario): Determines if the mechanism succeeds given a scenario. Applies the appropriate judging function based on the exception flag.
+        succeeds_batch(states): Same as succeeds for every row of a scenarios x credentials array, using array operations.
         priority_judging_function(scenario): The default judging function based on the priority rule. Returns True if a user wins, False if an attacker wins.
         priority_with_exception_judging_function(scenario): The judging function that considers the exception case. Applies the priority rule normally if the exception does not occur.
     """
@@ -78,6 +142,9 @@ class PriorityMechanism(Mechanism):
     
     def label(self):
         return "priority with rule %s and exception %s" % (self.rule, self.exception)
+
+    def cache_key(self):
+        return ("priority", tuple(self.rule), self.exception)
     
     def succeeds(self, scenario):
         if self.exception:
@@ -109,6 +176,77 @@ class PriorityMechanism(Mechanism):
         # Otherwise, apply the priority rule normally
         return self.priority_judging_function(scenario)
 
+    def succeeds_batch(self, states: np.ndarray) -> np.ndarray:
+        credentials = states[:, self.rule] # Columns in priority order
+        safe = credentials == St.SAFE.value
+        theft = credentials == St.THEFT.value
+        # The first decisive (safe or theft) credential decides. If there is none, first is 0 and it isn't safe.
+        first = np.argmax(safe | theft, axis=1)
+        wins = safe[np.arange(len(credentials)), first]
+        if self.exception:
+            lost_prefix = np.all(credentials[:, :-2] == St.LOST.value, axis=1)
+            wins = np.where(lost_prefix & safe[:, -2] & theft[:, -1], False, wins)
+            wins = np.where(lost_prefix & theft[:, -2] & safe[:, -1], True, wins)
+        return wins
+
+class PriorityMechanismFamily:
+    """
+    All n! * 2 priority mechanisms (with and without exception) for n credentials, generated lazily.
+    Attributes:
+        num_credentials (int): The number of credentials.
+        skip_equivalent (bool): Whether to skip mechanisms whose judging function coincides with an earlier one.
+            This only happens with two credentials, where the exception swaps the rule
+            (priority [0, 1] with exception is priority [1, 0] without exception).
+    Methods:
+        __len__(): The number of mechanisms in the family.
+        __getitem__(index): The mechanism at the given index, without enumerating the ones before it.
+        __iter__(): Iterates over the mechanisms in order.
+    Note: Mechanisms are ordered by rule (lexicographically, as in itertools.permutations), then exception (True before False).
+        Profiles are only computed when accessed.
+    """
+    def __init__(self, num_credentials: int, skip_equivalent: bool = False):
+        self.num_credentials = num_credentials
+        self.skip_equivalent = skip_equivalent
+        self._specs = None
+        if skip_equivalent and num_credentials == 2:
+            self._specs = []
+            seen = set()
+            for index in range(2 * math.factorial(num_credentials)):
+                (rule, exception) = self._unrank(index)
+                key = (tuple(reversed(rule)), False) if exception else (tuple(rule), exception)
+                if key not in seen:
+                    seen.add(key)
+                    self._specs.append((rule, exception))
+
+    def _unrank(self, index: int) -> tuple[list[int], bool]:
+        (perm_index, exception_index) = divmod(index, 2)
+        # Lexicographic unranking using the factorial number system
+        remaining = list(range(self.num_credentials))
+        rule = []
+        for i in range(self.num_credentials - 1, -1, -1):
+            (digit, perm_index) = divmod(perm_index, math.factorial(i))
+            rule.append(remaining.pop(digit))
+        return (rule, exception_index == 0)
+
+    def __len__(self):
+        if self._specs is not None:
+            return len(self._specs)
+        return 2 * math.factorial(self.num_credentials)
+
+    def __getitem__(self, index: int) -> PriorityMechanism:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Index %s out of range" % (index,))
+        (rule, exception) = self._specs[index] if self._specs is not None else self._unrank(index)
+        return PriorityMechanism(rule, exception)
+
+    def __iter__(self):
+        for rule in itertools.permutations(range(self.num_credentials)):
+            for exception in [True, False]:
+                if self._specs is None or (list(rule), exception) in self._specs:
+                    yield PriorityMechanism(list(rule), exception)
+
 class MajorityMechanism(Mechanism):
     """
     A mechanism that determines the success of a user based on the majority of credentials.
@@ -116,22 +254,35 @@ class MajorityMechanism(Mechanism):
         num_credentials (int): The number of credentials involved in the mechanism.
         tie_breaker_func (Callable[[list[int], list[int]], bool]): A function to resolve ties between user and attacker credentials.
         tie_break_label (list[int]): A list of binary evaluations corresponding to each pair of tie-breaking inputs. It is there solely for labelling purposes.
+        label_defines_tie_breaker (bool): Whether tie_breaker_func is the tie breaker given by tie_break_label, in which case
+            the profile is shared with the other mechanisms with the same label (see cache_key).
     Note: tie_break_label alone should in theory be enough to define a tie breaker. But I had some issues removing tie_breaker_func and solely depending on it.
     Methods:
         __repr__(): Returns a string representation of the MajorityMechanism instance.
         succeeds(scenario): Determines if the user succeeds based on the given scenario.
+        succeeds_batch(states): Same as succeeds for every row of a scenarios x credentials array, using array operations.
+        tie_break_table(): The tie breaker evaluated on every pair of credential sets, indexed by their bitmasks.
         number_of_tie_breaks(num_creds): Calculates the number of tie breaks for a given number of credentials.
         number_of_majority_mechanisms(n): Calculates the number of possible majority mechanisms for a given number of credentials.
     """
     def __init__(self, num_credentials, 
                  tie_breaker_func: Callable[[list[int], list[int]], bool],
-                 tie_break_label: list[int]):
+                 tie_break_label: list[int],
+                 label_defines_tie_breaker: bool = False):
         self.tie_breaker_func = tie_breaker_func
         self.tie_break_label = tie_break_label
+        self.label_defines_tie_breaker = label_defines_tie_breaker
+        self._tie_break_table = None
         super().__init__(num_credentials)
     
     def label(self):
         return """majority with %s creds and tie-breaker %s""" % (self.num_credentials, self.tie_break_label,)
+
+    # The label only identifies the tie breaker if the tie breaker was built from it (see the note above)
+    def cache_key(self):
+        if not self.label_defines_tie_breaker:
+            return None
+        return ("majority", self.num_credentials, tuple(self.tie_break_label))
     
     def succeeds(self, scenario):
         # Count the number of credentials known to the user and the attacker
@@ -152,6 +303,38 @@ class MajorityMechanism(Mechanism):
         else:
             return self.tie_breaker_func(user_credentials, attacker_credentials)
 
+    def tie_break_table(self) -> np.ndarray:
+        """
+        Returns a boolean array of size 4^n such that entry (user_mask << n) | attacker_mask is the tie breaker
+        evaluated on the credentials whose bits are set in user_mask and attacker_mask. Only ties
+        (same number of credentials, different sets) are filled. Built once and cached.
+        """
+        if self._tie_break_table is None:
+            n = self.num_credentials
+            table = np.zeros(4**n, dtype=bool)
+            subsets = [[i for i in range(n) if (mask >> i) & 1] for mask in range(2**n)]
+            for user_mask in range(2**n):
+                for attacker_mask in range(2**n):
+                    if user_mask != attacker_mask and len(subsets[user_mask]) == len(subsets[attacker_mask]):
+                        table[(user_mask << n) | attacker_mask] = self.tie_breaker_func(subsets[user_mask],
+                                                                                        subsets[attacker_mask])
+            self._tie_break_table = table
+        return self._tie_break_table
+
+    def succeeds_batch(self, states: np.ndarray) -> np.ndarray:
+        user = (states == St.SAFE.value) | (states == St.LEAKED.value)
+        attacker = (states == St.THEFT.value) | (states == St.LEAKED.value)
+        diff = user.sum(axis=1) - attacker.sum(axis=1)
+        wins = diff > 0
+        # Ties where both submit the same credentials (no safe or theft credential) are lost
+        ties = (diff == 0) & np.any(user != attacker, axis=1)
+        if np.any(ties):
+            weights = 1 << np.arange(self.num_credentials, dtype=np.int64)
+            user_masks = user[ties] @ weights
+            attacker_masks = attacker[ties] @ weights
+            wins[ties] = self.tie_break_table()[(user_masks << self.num_credentials) | attacker_masks]
+        return wins
+
     # (2n C n) - 2**n / 2
     @staticmethod
     def number_of_tie_breaks(num_creds):
@@ -164,6 +347,84 @@ class MajorityMechanism(Mechanism):
     def number_of_majority_mechanisms(n):
         return 2**(MajorityMechanism.number_of_tie_breaks(n))
 
+class WeightedMechanism(Mechanism):
+    """
+    A mechanism that compares the total weight of the credentials known to the user and to the attacker.
+    Leaked credentials count for both and cancel out, so the user wins if the safe credentials outweigh the stolen ones.
+    Ties go to whoever has the first safe or stolen credential in the tie-break rule, and are lost if there is none.
+    Attributes:
+        weights (list[int]): The nonnegative integer weight of each credential.
+        rule (list[int]): The tie-break rule, a priority order over the credentials.
+    Methods:
+        succeeds(scenario): Determines if the user succeeds based on the given scenario.
+        succeeds_batch(states): Same as succeeds for every row of a scenarios x credentials array, using array operations.
+        success_probability(probabilities): Dynamic program over the weight difference, in O(n * sum(weights)),
+            without enumerating scenarios.
+    Note: With equal weights, this is the majority mechanism with uniform_priority_tie_breaker. With weights
+        2^(n-1), ..., 2, 1 following the rule, this is the priority mechanism without exception.
+    """
+    def __init__(self, weights: list[int], rule: list[int] = None):
+        if any(not isinstance(w, (int, np.integer)) or w < 0 for w in weights):
+            raise ValueError("Weights (%s) must be nonnegative integers" % (weights,))
+        self.weights = [int(w) for w in weights]
+        self.rule = list(range(len(weights))) if rule is None else list(rule)
+        if sorted(self.rule) != list(range(len(weights))):
+            raise ValueError("Rule (%s) is not well defined" % (rule,))
+        super().__init__(len(weights))
+
+    def label(self):
+        return "weighted with weights %s and tie-break rule %s" % (self.weights, self.rule)
+
+    def cache_key(self):
+        return ("weighted", tuple(self.weights), tuple(self.rule))
+
+    def succeeds(self, scenario):
+        states = scenario.credential_states
+        diff = sum(w for (w, st) in zip(self.weights, states) if st == St.SAFE) - \
+            sum(w for (w, st) in zip(self.weights, states) if st == St.THEFT)
+        if diff != 0:
+            return diff > 0
+        for x in self.rule:
+            if states[x] == St.SAFE:
+                return True
+            elif states[x] == St.THEFT:
+                return False
+        return False
+
+    def succeeds_batch(self, states: np.ndarray) -> np.ndarray:
+        weights = np.array(self.weights, dtype=np.int64)
+        safe = states == St.SAFE.value
+        theft = states == St.THEFT.value
+        diff = safe @ weights - theft @ weights
+        # Tie break as in PriorityMechanism.succeeds_batch
+        ordered_safe = safe[:, self.rule]
+        first = np.argmax(ordered_safe | theft[:, self.rule], axis=1)
+        tie_wins = ordered_safe[np.arange(len(states)), first]
+        return np.where(diff == 0, tie_wins, diff > 0)
+
+    def success_probability(self, probabilities: list[CredentialProbabilities]) -> float:
+        if len(probabilities) != self.num_credentials:
+            raise ValueError("Number of probabilities must match number of credentials")
+        total = sum(self.weights)
+        # distribution[t, total + diff]: t is 0 if no credential was safe or stolen yet,
+        # and 1 (resp. 2) if the first one in rule order was safe (resp. stolen)
+        distribution = np.zeros((3, 2 * total + 1))
+        distribution[0, total] = 1
+        for x in self.rule:
+            w = self.weights[x]
+            p = probabilities[x]
+            neutral = p.get_probability(St.LEAKED) + p.get_probability(St.LOST)
+            up = np.zeros_like(distribution) # The credential is safe
+            down = np.zeros_like(distribution) # The credential is stolen
+            up[:, w:] = distribution[:, :2 * total + 1 - w] * p.get_probability(St.SAFE)
+            down[:, :2 * total + 1 - w] = distribution[:, w:] * p.get_probability(St.THEFT)
+            next_distribution = distribution * neutral
+            next_distribution[1:] += up[1:] + down[1:]
+            next_distribution[1] += up[0]
+            next_distribution[2] += down[0]
+            distribution = next_distribution
+        return float(distribution[:, total + 1:].sum() + distribution[1, total])
+
 #### We now provide some tools related to tie-breaking functions
 
 def break_ties(S1, S2, all_possible_inputs, tie_breaker) -> bool:
@@ -0,0 +1,137 @@
+"""
+Declarative mechanisms: deployed mechanisms described as data instead of code.
+
+A spec is a dict (or the equivalent JSON object) holding an ordered decision list over credential states:
+
+    {"name": "HDFC Bank", "num_credentials": 3,
+     "rules": [{"if": {1: "safe"}, "then": true},
+               {"if": {1: "lost", 2: "safe"}, "then": true}],
+     "default": false}
+
+The first rule whose conditions all hold decides whether the user wins, and `default` applies if none does.
+A condition maps a credential to a state name (theft, leaked, lost, safe) or a list of state names.
+Credentials without a condition can be in any state. In JSON, credentials are given as strings ("1").
+
+A `SpecMechanism` judges whole scenario arrays with a table lookup per rule, so its profile is compiled once
+(and cached like any other mechanism's) and it can be scored with `profile_matrix`, `ProfileStore`,
+`compile_mechanism`, etc.
+"""
+
+import json
+import numpy as np
+from maximal_mechanisms import Mechanism, profile_matrix
+from scenarios import CredentialProbabilities, St, scenario_probability_matrix
+
+def _parse_states(states) -> tuple[int, ...]:
+    if isinstance(states, (str, St)):
+        states = [states]
+    values = set()
+    for st in states:
+        if isinstance(st, St):
+            values.add(st.value)
+        elif isinstance(st, str) and st.upper() in St.__members__:
+            values.add(St[st.upper()].value)
+        else:
+            raise ValueError("Unknown credential state %s" % (st,))
+    return tuple(sorted(values))
+
+class SpecMechanism(Mechanism):
+    """
+    A mechanism defined by an ordered decision list (see the module docstring).
+
+    Attributes:
+        name (str): The name of the mechanism, used as its label.
+        rules (list[tuple[dict[int, tuple[int, ...]], bool]]): For each rule, the allowed St values of the
+            constrained credentials, and the outcome.
+        default (bool): The outcome when no rule applies.
+
+    Methods:
+        from_json(text): Parses a spec from a JSON string.
+        allowed_states(): The rules as a (rules, credentials, 4) boolean table of allowed states.
+        succeeds(scenario): Determines if the user wins the given scenario.
+        succeeds_batch(states): Same as succeeds for every row of a scenarios x credentials array, using array operations.
+    """
+    def __init__(self, spec: dict):
+        num_credentials = spec["num_credentials"]
+        self.name = spec.get("name", "")
+        self.default = bool(spec.get("default", False))
+        self.rules = []
+        for rule in spec["rules"]:
+            conditions = {}
+            for (credential, states) in rule["if"].items():
+                credential = int(credential)
+                if not 0 <= credential < num_credentials:
+                    raise ValueError("Credential %s out of range in spec %s" % (credential, self.name))
+                conditions[credential] = _parse_states(states)
+            self.rules.append((conditions, bool(rule["then"])))
+        self._allowed = None
+        super().__init__(num_credentials)
+
+    @staticmethod
+    def from_json(text: str) -> "SpecMechanism":
+        return SpecMechanism(json.loads(text))
+
+    def label(self):
+        return self.name if self.name else "spec with rules %s and default %s" % (self.rules, self.default)
+
+    # The name is not part of the key, so that identical specs share their profile
+    def cache_key(self):
+        rules = tuple((tuple(sorted(conditions.items())), outcome) for (conditions, outcome) in self.rules)
+        return ("spec", self.num_credentials, rules, self.default)
+
+    def allowed_states(self) -> np.ndarray:
+        if self._allowed is None:
+            allowed = np.ones((len(self.rules), self.num_credentials, 4), dtype=bool)
+            for (r, (conditions, _)) in enumerate(self.rules):
+                for (credential, states) in conditions.items():
+                    allowed[r, credential, :] = False
+                    allowed[r, credential, list(states)] = True
+            self._allowed = allowed
+        return self._allowed
+
+    def succeeds(self, scenario):
+        for (conditions, outcome) in self.rules:
+            if all(scenario.credential_states[credential].value in states
+                   for (credential, states) in conditions.items()):
+                return outcome
+        return self.default
+
+    def succeeds_batch(self, states: np.ndarray) -> np.ndarray:
+        wins = np.full(len(states), self.default, dtype=bool)
+        undecided = np.ones(len(states), dtype=bool)
+        columns = np.arange(self.num_credentials)
+        for (allowed, (_, outcome)) in zip(self.allowed_states(), self.rules):
+            matches = undecided & np.all(allowed[columns, states], axis=1)
+            wins[matches] = outcome
+            undecided &= ~matches
+        return wins
+
+def load_specs(path: str) -> list[SpecMechanism]:
+    """Loads a JSON file holding one spec or a list of specs"""
+    with open(path) as f:
+        specs = json.load(f)
+    if isinstance(specs, dict):
+        specs = [specs]
+    return [SpecMechanism(spec) for spec in specs]
+
+def audit_mechanisms(mechanisms: list[Mechanism], maximal: list[Mechanism],
+                     probabilities: list[CredentialProbabilities]) -> list[tuple]:
+    """
+    Compares deployed mechanisms against a maximal set, scoring all of them with one matrix product.
+
+    Returns:
+        list[tuple]: For each mechanism, its success probability, the best success probability in the maximal set,
+        and the maximal mechanisms whose profile contains its profile (it is not maximal if one of them differs from it).
+    """
+    if any(M.num_credentials != len(probabilities) for M in mechanisms + maximal):
+        raise ValueError("Number of probabilities must match number of credentials")
+    scenario_probabilities = scenario_probability_matrix(np.array([[p.to_vector() for p in probabilities]]))
+    values = (scenario_probabilities @ profile_matrix(mechanisms + maximal))[0]
+    best_value = float(values[len(mechanisms):].max())
+    maximal_bitmasks = [M.profile_bitmask() for M in maximal]
+    audit = []
+    for (M, value) in zip(mechanisms, values):
+        bitmask = M.profile_bitmask()
+        containing = [N for (N, mask) in zip(maximal, maximal_bitmasks) if bitmask & ~mask == 0]
+        audit.append((float(value), best_value, containing))
+    return audit
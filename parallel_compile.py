@@ -0,0 +1,101 @@
+"""
+Parallel compilation of one mechanism's profile.
+
+The 4^n scenario indices are split into contiguous chunks that a pool of forked worker processes judges with
+`succeeds_batch`. Workers derive the states of their chunk from the indices (credential i of scenario j is in state
+(j >> 2i) & 3, see `unpack_states`), and write the packed win bits straight into a bitmap in shared memory,
+so neither scenarios nor results are pickled. The mechanism reaches the workers through the fork, so mechanisms
+holding lambdas (e.g., majority tie breakers) work too.
+
+Chunks hold a multiple of 8 scenarios, so that each worker owns whole bytes of the bitmap. Tables that a mechanism
+builds on first use (e.g., `MajorityMechanism.tie_break_table`, which takes longer than judging all 4^n scenarios)
+are built before forking, so that workers inherit them instead of each rebuilding them. `benchmark_compile` times
+the compilation with different numbers of processes (run this module for a report).
+"""
+
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import time
+import numpy as np
+from maximal_mechanisms import MajorityMechanism, Mechanism, uniform_priority_tie_breaker
+from scenarios import Profile, generate_all_scenarios, unpack_states
+
+# Set in each worker by _init_worker
+_worker_mechanism = None
+_worker_bitmap = None
+
+def _init_worker(M: Mechanism, name: str):
+    global _worker_mechanism, _worker_bitmap
+    _worker_mechanism = M
+    _worker_bitmap = shared_memory.SharedMemory(name=name)
+
+def _compile_chunk(bounds: tuple[int, int]):
+    (start, stop) = bounds
+    states = unpack_states(np.arange(start, stop, dtype=np.int64), _worker_mechanism.num_credentials)
+    wins = _worker_mechanism.succeeds_batch(states)
+    packed = np.packbits(wins, bitorder="little")
+    np.frombuffer(_worker_bitmap.buf, dtype=np.uint8)[start // 8:start // 8 + len(packed)] = packed
+
+def compile_bitmap_parallel(M: Mechanism, processes: int = None, chunk_size: int = 1 << 14) -> np.ndarray:
+    """
+    Returns the packed profile of M (bit i, in little bit order, is scenario i of generate_all_scenarios(n),
+    as in ProfileStore), computed by `processes` workers (all cores by default) on chunks of chunk_size scenarios.
+    """
+    num_scenarios = 4**M.num_credentials
+    if num_scenarios < 8:
+        return np.packbits(M.profile_indicator(), bitorder="little")
+    chunk_size = max(8, chunk_size - chunk_size % 8)
+    chunks = [(start, min(start + chunk_size, num_scenarios)) for start in range(0, num_scenarios, chunk_size)]
+    processes = min(processes or os.cpu_count() or 1, len(chunks))
+    if hasattr(M, "tie_break_table"):
+        M.tie_break_table()
+    bitmap = shared_memory.SharedMemory(create=True, size=num_scenarios // 8)
+    try:
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes, initializer=_init_worker, initargs=(M, bitmap.name)) as pool:
+            pool.map(_compile_chunk, chunks, chunksize=1)
+        return np.frombuffer(bitmap.buf, dtype=np.uint8).copy()
+    finally:
+        bitmap.close()
+        bitmap.unlink()
+
+def compile_profile_parallel(M: Mechanism, processes: int = None, chunk_size: int = 1 << 14) -> Profile:
+    """Same as M.compute_profile(), in parallel (see compile_bitmap_parallel)"""
+    bitmap = compile_bitmap_parallel(M, processes, chunk_size)
+    wins = np.unpackbits(bitmap, count=4**M.num_credentials, bitorder="little")
+    all_scenarios = generate_all_scenarios(M.num_credentials)
+    return Profile([all_scenarios[i] for i in np.flatnonzero(wins)])
+
+def benchmark_compile(M: Mechanism, process_counts: list[int], chunk_size: int = 1 << 14) -> dict:
+    """
+    Returns the seconds that compile_bitmap_parallel takes on M with every number of processes, after checking
+    that all of them compile the same bitmap. Per-mechanism tables are built once beforehand, so the timings
+    only compare the parallel judging.
+    """
+    if hasattr(M, "tie_break_table"):
+        M.tie_break_table()
+    seconds = {}
+    bitmaps = []
+    for processes in process_counts:
+        start = time.perf_counter()
+        bitmaps.append(compile_bitmap_parallel(M, processes, chunk_size))
+        seconds[processes] = time.perf_counter() - start
+    if any(not np.array_equal(bitmap, bitmaps[0]) for bitmap in bitmaps):
+        raise Exception("Compilations with different numbers of processes disagree")
+    return seconds
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--credentials", type=int, default=10)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+    n = args.credentials
+    rule = list(range(n))
+    M = MajorityMechanism(n, lambda S1, S2: uniform_priority_tie_breaker(S1, S2, rule), rule)
+    start = time.perf_counter()
+    M.tie_break_table()
+    print("tie break table: %.2f s" % (time.perf_counter() - start,))
+    for (processes, seconds) in benchmark_compile(M, sorted(set(args.processes))).items():
+        print("%3d processes: %.2f s" % (processes, seconds))
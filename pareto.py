@@ -0,0 +1,43 @@
+"""
+Pareto skyline of mechanisms under profile inclusion.
+
+A mechanism is dominated if its profile is a strict subset of another mechanism's profile: the other
+mechanism wins every scenario it wins, and more. Profiles are compared as bitmasks (see `Profile.bitmask`),
+i.e., as exact sets of scenarios, without considering credential permutations.
+"""
+
+from maximal_mechanisms import Mechanism
+
+def non_dominated_indices(bitmasks: list[int]) -> list[int]:
+    """
+    Returns the indices (in increasing order) of the bitmasks that are not a strict subset of another one.
+
+    Bitmasks are visited by decreasing popcount, so every strict superset of a bitmask is visited before it.
+    A dominated bitmask is dominated by some frontier member too (by transitivity), so each candidate is only
+    checked against the frontier members containing its rarest bit, found with an inverted index from each
+    scenario bit to the frontier members containing it.
+    """
+    order = sorted(range(len(bitmasks)), key=lambda i: -bitmasks[i].bit_count())
+    frontier = []
+    members_with_bit = {}
+    for i in order:
+        mask = bitmasks[i]
+        bits = []
+        rest = mask
+        while rest:
+            low = rest & -rest
+            bits.append(low.bit_length() - 1)
+            rest ^= low
+        # The empty profile is dominated by any non-empty one
+        candidates = min((members_with_bit.get(b, []) for b in bits), key=len, default=frontier)
+        if any(mask & ~bitmasks[j] == 0 and mask != bitmasks[j] for j in candidates):
+            continue
+        frontier.append(i)
+        for b in bits:
+            members_with_bit.setdefault(b, []).append(i)
+    return sorted(frontier)
+
+def pareto_frontier(mechanisms: list[Mechanism]) -> list[Mechanism]:
+    """Returns the mechanisms whose profile is not a strict subset of another mechanism's profile"""
+    bitmasks = [M.profile_bitmask() for M in mechanisms]
+    return [mechanisms[i] for i in non_dominated_indices(bitmasks)]
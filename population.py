@@ -0,0 +1,106 @@
+"""
+Population-weighted mechanism selection.
+
+Users differ: some have hardware keys, some only SMS. For a population described by weighted credential
+probability profiles, the best mechanism maximizes the expected success probability
+
+    sum_u w_u * P(M, u) / sum_u w_u
+
+over all users u. Profiles are streamed in chunks: a chunk's scenario probabilities are weighted and
+summed per segment, then multiplied by the profile matrix once, so memory does not grow with the population.
+"""
+
+import itertools
+import numpy as np
+from maximal_mechanisms import Mechanism, profile_matrix
+from scenarios import scenario_probability_matrix
+from utils import best_with_ties
+
+class PopulationScorer:
+    """
+    Accumulates the expected success probability of mechanisms over a weighted population of user profiles.
+
+    Attributes:
+        mechanisms (list[Mechanism]): The candidate mechanisms. They must all have the same number of credentials.
+        num_credentials (int): The number of credentials.
+        chunk_size (int): The number of user profiles processed together.
+        total_weight (float): The total weight of the users added so far.
+
+    Methods:
+        add(weighted_profiles): Streams (weight, probabilities) or (weight, probabilities, segment) entries.
+        expected_success_probabilities(segment): Per-mechanism expected success probability (overall or in a segment).
+        best_mechanisms(segment): The population-optimal mechanisms and their expected success probability.
+        segment_breakdown(): The best mechanisms of every segment.
+    """
+    def __init__(self, mechanisms: list[Mechanism], chunk_size: int = 1024):
+        self.mechanisms = mechanisms
+        self.num_credentials = mechanisms[0].num_credentials
+        self.chunk_size = chunk_size
+        self._profiles = profile_matrix(mechanisms)
+        self.total_weight = 0.0
+        self._totals = np.zeros(len(mechanisms))
+        # segment -> (total weight, per-mechanism weighted sums)
+        self._segments = {}
+
+    def add(self, weighted_profiles):
+        """
+        Adds users to the population. Each entry is (weight, probabilities) or (weight, probabilities, segment),
+        where probabilities is a list of CredentialProbabilities. Entries without a segment only count overall.
+        """
+        entries = iter(weighted_profiles)
+        while True:
+            chunk = list(itertools.islice(entries, self.chunk_size))
+            if len(chunk) == 0:
+                break
+            self._add_chunk(chunk)
+        return self
+
+    def _add_chunk(self, chunk):
+        weights = np.array([entry[0] for entry in chunk], dtype=np.float64)
+        if np.any(weights < 0):
+            raise ValueError("Weights must be non-negative")
+        for entry in chunk:
+            if len(entry[1]) != self.num_credentials:
+                raise ValueError("Number of probabilities must match number of credentials")
+        probabilities = np.array([[p.to_vector() for p in entry[1]] for entry in chunk])
+        segments = [entry[2] if len(entry) > 2 else None for entry in chunk]
+        keys = list(dict.fromkeys(segments))
+        # One row per segment in the chunk: the weighted sum of its users' scenario probabilities
+        membership = np.zeros((len(keys), len(chunk)))
+        membership[[keys.index(s) for s in segments], np.arange(len(chunk))] = weights
+        values = (membership @ scenario_probability_matrix(probabilities)) @ self._profiles
+        self.total_weight += weights.sum()
+        self._totals += values.sum(axis=0)
+        for (key, row, weight) in zip(keys, values, membership.sum(axis=1)):
+            if key is None:
+                continue
+            (segment_weight, segment_totals) = self._segments.get(key, (0.0, np.zeros(len(self.mechanisms))))
+            self._segments[key] = (segment_weight + weight, segment_totals + row)
+
+    def expected_success_probabilities(self, segment=None) -> np.ndarray:
+        (weight, totals) = (self.total_weight, self._totals) if segment is None else self._segments[segment]
+        if weight == 0:
+            raise ValueError("The population is empty")
+        return totals / weight
+
+    def best_mechanisms(self, segment=None):
+        """
+        Returns:
+            tuple: A tuple containing the best mechanisms and their expected success probability
+        """
+        (best, best_value) = best_with_ties(self.mechanisms, self.expected_success_probabilities(segment))
+        return (best, float(best_value))
+
+    def segment_breakdown(self) -> dict:
+        """Returns, for every segment, its total weight and its best mechanisms with their expected success probability"""
+        return {segment: (weight, self.best_mechanisms(segment)) for (segment, (weight, _)) in self._segments.items()}
+
+def find_population_best_mechanisms(mechanisms: list[Mechanism], weighted_profiles, chunk_size: int = 1024):
+    """
+    Returns:
+        tuple: A tuple containing the population-optimal mechanisms, their expected success probability,
+        and the per-segment breakdown (see PopulationScorer.segment_breakdown)
+    """
+    scorer = PopulationScorer(mechanisms, chunk_size).add(weighted_profiles)
+    (best, value) = scorer.best_mechanisms()
+    return (best, value, scorer.segment_breakdown())
@@ -0,0 +1,218 @@
+"""
+Python reference simulator of contracts/priorityWallet.sol, and a benchmark of its winner selection.
+
+The wallet registers credentials (addresses) in priority order: credential_list[0] has priority 1, the highest.
+During a withdrawal, credential holders create claims and approve existing ones until the expiry time. Then
+`withdraw` scans the priorities from highest to lowest, and at each level where some remaining claim is supported,
+drops the remaining claims that are not. The first remaining claim wins. This costs
+O(num_credentials * num_claims) supporter reads.
+
+The same winner is the claim whose supporters, as a bitmask with priority 1 as the most significant bit, is the
+largest (ties go to the smallest claim ID): one comparison per claim. Since supporter sets only grow, the largest
+mask can even be maintained on every claim and approval, making `withdraw` O(1).
+
+A priority mechanism (without exception) is the wallet where the user submits a claim with the credentials they
+know (SAFE or LEAKED), after the attacker submits theirs (THEFT or LEAKED), so `wallet_outcome` can be checked
+against `PriorityMechanism.priority_judging_function`.
+"""
+
+import random
+import time
+from typing import Hashable
+from scenarios import Scenario, St
+
+class Revert(Exception):
+    """A failed assert in the contract"""
+    pass
+
+ALGORITHMS = ["scan", "bitmask", "incremental"]
+
+class PriorityWallet:
+    """
+    Attributes:
+        num_credentials (int): The number of registered credentials.
+        priority (dict): The priority (1 is the highest) of every registered credential.
+        timestamp (int): The current block timestamp.
+        claims (list[tuple[list[bool], int, Hashable]]): The supporters (indexed by priority, entry 0 unused),
+            amount and destination of every claim.
+        operations (int): The number of elementary steps (supporter writes, loop iterations) executed so far,
+            as a proxy for gas.
+        maintenance_operations (int): The number of comparisons spent maintaining the largest mask, which only
+            the "incremental" algorithm needs.
+
+    Methods:
+        initiate_withdrawal(sender), create_new_claim(sender, amount, to), add_approval(sender, claim_id),
+        get_claim_supporters(claim_id), withdraw(algorithm): As in the contract. withdraw returns the winning claim ID,
+            or None if there is none, using the "scan" (contract), "bitmask" or "incremental" algorithm.
+        advance_time(seconds): Moves the block timestamp forward.
+    """
+    delay = 100
+
+    def __init__(self, credential_list: list[Hashable]):
+        self.num_credentials = len(credential_list)
+        self.priority = {credential: i + 1 for (i, credential) in enumerate(credential_list)}
+        self.withdrawal_in_progress = False
+        self.timestamp = 0
+        self.expiry_time = 0
+        self.claims = []
+        self.operations = 0
+        self.maintenance_operations = 0
+        self._masks = []
+        self._best = None
+
+    def _check(self, condition: bool):
+        if not condition:
+            raise Revert()
+
+    def advance_time(self, seconds: int):
+        self.timestamp += seconds
+
+    def initiate_withdrawal(self, sender: Hashable):
+        self._check(self.priority.get(sender, 0) > 0)
+        self._check(not self.withdrawal_in_progress)
+        self.withdrawal_in_progress = True
+        self.expiry_time = self.timestamp + self.delay
+        self.claims = []
+        self._masks = []
+        self._best = None
+
+    def _support(self, claim_id: int, sender: Hashable):
+        p = self.priority[sender]
+        self.claims[claim_id][0][p] = True
+        self._masks[claim_id] |= 1 << (self.num_credentials - p)
+        self.operations += 1
+        # Masks only grow, so the largest one is either the previous largest or the updated one
+        self.maintenance_operations += 1
+        best = self._best
+        if best is None or self._masks[claim_id] > self._masks[best] or \
+                (self._masks[claim_id] == self._masks[best] and claim_id < best):
+            self._best = claim_id
+
+    def create_new_claim(self, sender: Hashable, amount: int, to: Hashable) -> int:
+        self._check(self.priority.get(sender, 0) > 0)
+        self._check(self.withdrawal_in_progress)
+        self._check(self.timestamp <= self.expiry_time)
+        self.claims.append(([False] * (self.num_credentials + 1), amount, to))
+        self._masks.append(0)
+        claim_id = len(self.claims) - 1
+        self._support(claim_id, sender)
+        return claim_id
+
+    def add_approval(self, sender: Hashable, claim_id: int):
+        self._check(self.withdrawal_in_progress)
+        self._check(claim_id < len(self.claims))
+        self._check(self.timestamp <= self.expiry_time)
+        self._check(self.priority.get(sender, 0) > 0)
+        self._support(claim_id, sender)
+
+    def get_claim_supporters(self, claim_id: int) -> list[bool]:
+        return list(self.claims[claim_id][0])
+
+    def withdraw(self, algorithm: str = "scan"):
+        self._check(self.timestamp > self.expiry_time)
+        self._check(self.withdrawal_in_progress)
+        if algorithm == "scan":
+            winner = self._scan_winner()
+        elif algorithm == "bitmask":
+            winner = self._bitmask_winner()
+        elif algorithm == "incremental":
+            self.operations += 1
+            winner = self._best
+        else:
+            raise ValueError("Unknown algorithm %s" % (algorithm,))
+        if winner is not None:
+            self.withdrawal_in_progress = False
+        return winner
+
+    def _scan_winner(self):
+        num_claims = len(self.claims)
+        potential_winners = [True] * num_claims
+        self.operations += num_claims
+        for p in range(1, self.num_credentials + 1):
+            found_any = False
+            for c in range(num_claims):
+                self.operations += 1
+                if potential_winners[c] and self.claims[c][0][p]:
+                    found_any = True
+            if found_any:
+                for c in range(num_claims):
+                    self.operations += 1
+                    if potential_winners[c] and not self.claims[c][0][p]:
+                        potential_winners[c] = False
+        for c in range(num_claims):
+            self.operations += 1
+            if potential_winners[c]:
+                return c
+        return None
+
+    def _bitmask_winner(self):
+        best = None
+        for c in range(len(self.claims)):
+            self.operations += 1
+            if best is None or self._masks[c] > self._masks[best]:
+                best = c
+        return best
+
+def wallet_outcome(rule: list[int], scenario: Scenario, algorithm: str = "scan") -> bool:
+    """Whether the user's claim wins in a wallet whose priorities follow the rule"""
+    wallet = PriorityWallet(rule)
+    wallet.initiate_withdrawal(rule[0])
+    states = scenario.credential_states
+    user_claim = None
+    # The attacker claims first, so that identical claims go to the attacker
+    for (party, known) in [("attacker", [St.THEFT, St.LEAKED]), ("user", [St.SAFE, St.LEAKED])]:
+        credentials = [c for c in rule if states[c] in known]
+        if len(credentials) == 0:
+            continue
+        claim_id = wallet.create_new_claim(credentials[0], 1, party)
+        for c in credentials[1:]:
+            wallet.add_approval(c, claim_id)
+        if party == "user":
+            user_claim = claim_id
+    wallet.advance_time(wallet.delay + 1)
+    winner = wallet.withdraw(algorithm)
+    return winner is not None and winner == user_claim
+
+def benchmark(num_credentials: int, num_claims: int, num_approvals: int, seed: int = 0) -> dict:
+    """
+    Replays random claims and approvals on one wallet per algorithm, checks that the winners agree, and returns
+    the number of operations of withdraw and the number spent on claims and approvals, for every algorithm.
+    Only the incremental algorithm pays for maintaining the largest mask during claims and approvals.
+    """
+    rng = random.Random(seed)
+    credentials = list(range(num_credentials))
+    actions = [("claim", rng.choice(credentials), None) for _ in range(num_claims)]
+    actions += [("approve", rng.choice(credentials), rng.randrange(num_claims)) for _ in range(num_approvals)]
+    rest = actions[1:]
+    rng.shuffle(rest)
+    actions = actions[:1] + rest # Approvals of claims that don't exist yet are skipped
+    report = {}
+    winners = set()
+    for algorithm in ALGORITHMS:
+        wallet = PriorityWallet(credentials)
+        wallet.initiate_withdrawal(0)
+        for (kind, sender, claim_id) in actions:
+            if kind == "claim":
+                wallet.create_new_claim(sender, 1, sender)
+            elif claim_id < len(wallet.claims):
+                wallet.add_approval(sender, claim_id)
+        wallet.advance_time(wallet.delay + 1)
+        before = wallet.operations
+        start = time.perf_counter()
+        winners.add(wallet.withdraw(algorithm))
+        seconds = time.perf_counter() - start
+        setup_operations = before + (wallet.maintenance_operations if algorithm == "incremental" else 0)
+        report[algorithm] = {"setup_operations": setup_operations,
+                             "withdraw_operations": wallet.operations - before,
+                             "withdraw_seconds": seconds}
+    if len(winners) != 1:
+        raise Exception("Algorithms disagree on the winner: %s" % (winners,))
+    return report
+
+if __name__ == '__main__':
+    for num_credentials in [3, 8, 32, 128]:
+        for num_claims in [10, 1000, 5000]:
+            report = benchmark(num_credentials, num_claims, 4 * num_claims)
+            print("credentials %4d claims %5d: " % (num_credentials, num_claims) +
+                  ", ".join("%s %d ops (%.2e s)" % (a, r["withdraw_operations"], r["withdraw_seconds"])
+                            for (a, r) in report.items()))
@@ -0,0 +1,115 @@
+"""
+On-disk store of many mechanism profiles as packed bitmaps in one memory-mapped file.
+
+At n = 9-10, a profile is a 2^18-2^20 bit bitmap (bit i is scenario i of generate_all_scenarios(n), as in
+`Profile.bitmask`), so thousands of profiles don't fit in RAM as `Profile` lists. The store keeps them in one
+file that is memory-mapped read-only: bitmaps are zero-copy NumPy views, and worker processes opening the same
+file share one copy of it through the page cache.
+
+File format: the magic bytes, a 4-byte little-endian header length, a JSON header (number of credentials,
+labels in storage order, bytes per bitmap), padding to a multiple of 64 bytes, then one packed bitmap
+(little bit order) per mechanism.
+"""
+
+import json
+import numpy as np
+from maximal_mechanisms import Mechanism
+from scenarios import CredentialProbabilities, scenario_blocks, scenario_probability_matrix
+
+MAGIC = b"MECHPRF1"
+
+def write_profile_store(path: str, mechanisms: list[Mechanism]):
+    """
+    Writes the profiles of the mechanisms, indexed by their labels. Profiles are computed one at a time and
+    streamed block by block (see scenario_blocks), so n = 10-14 only costs time.
+    """
+    if len(set(M.num_credentials for M in mechanisms)) > 1:
+        raise ValueError("All mechanisms must have the same number of credentials")
+    labels = [M.label() for M in mechanisms]
+    if len(set(labels)) != len(labels):
+        raise ValueError("Mechanism labels must be unique")
+    num_credentials = mechanisms[0].num_credentials if mechanisms else 0
+    bitmap_bytes = (4**num_credentials + 7) // 8
+    header = json.dumps({"num_credentials": num_credentials, "bitmap_bytes": bitmap_bytes,
+                         "labels": labels}).encode()
+    offset = len(MAGIC) + 4 + len(header)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        f.write(b"\0" * (-offset % 64))
+        for M in mechanisms:
+            for (_, states) in scenario_blocks(num_credentials):
+                f.write(np.packbits(M.succeeds_batch(states), bitorder="little").tobytes())
+
+class ProfileStore:
+    """
+    Read-only, memory-mapped access to a file written by write_profile_store.
+
+    Attributes:
+        num_credentials (int): The number of credentials of the stored mechanisms.
+        labels (list[str]): The labels of the stored mechanisms, in storage order.
+        bitmaps (np.memmap): The (number of mechanisms, bytes per bitmap) uint8 array of packed profiles.
+
+    Methods:
+        bitmap(label): The packed profile of a mechanism, as a zero-copy view.
+        indicator(label): The unpacked profile of a mechanism, as a boolean array.
+        count(label): The number of scenarios in the profile of a mechanism.
+        success_probabilities(probabilities): The success probability of every stored mechanism.
+    """
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a profile store" % (path,))
+            header_length = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(header_length))
+        self.num_credentials = header["num_credentials"]
+        self.labels = header["labels"]
+        self._index = {label: i for (i, label) in enumerate(self.labels)}
+        offset = len(MAGIC) + 4 + header_length
+        offset += -offset % 64
+        shape = (len(self.labels), header["bitmap_bytes"])
+        if len(self.labels) == 0:
+            self.bitmaps = np.zeros(shape, dtype=np.uint8)
+        else:
+            self.bitmaps = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=shape)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self._index
+
+    def bitmap(self, label: str) -> np.ndarray:
+        return self.bitmaps[self._index[label]]
+
+    def indicator(self, label: str) -> np.ndarray:
+        return np.unpackbits(self.bitmap(label), count=4**self.num_credentials, bitorder="little").astype(bool)
+
+    def count(self, label: str) -> int:
+        return int(np.bitwise_count(self.bitmap(label)).sum())
+
+    def success_probabilities(self, probabilities: list[CredentialProbabilities],
+                              max_bytes: int = 1 << 24) -> np.ndarray:
+        """
+        Scores all stored mechanisms, block by block. A block of the bitmaps is unpacked (one byte per scenario)
+        and converted to floats by the matrix product (eight more bytes per scenario), so blocks span as many
+        mechanisms, or else as many bytes of one bitmap, as keep this under max_bytes.
+        """
+        if len(probabilities) != self.num_credentials:
+            raise ValueError("Number of probabilities must match number of credentials")
+        scenario_probabilities = scenario_probability_matrix(np.array([[p.to_vector() for p in probabilities]]))[0]
+        bitmap_bytes = self.bitmaps.shape[1]
+        if len(scenario_probabilities) < 8 * bitmap_bytes:
+            # Padding bits of the last byte (n = 1) get probability 0
+            scenario_probabilities = np.pad(scenario_probabilities, (0, 8 * bitmap_bytes - len(scenario_probabilities)))
+        block_bytes = max(1, min(bitmap_bytes, max_bytes // (9 * 8)))
+        block_rows = max(1, max_bytes // (9 * 8 * bitmap_bytes)) if bitmap_bytes > 0 else 1
+        values = np.zeros(len(self))
+        for start in range(0, len(self), block_rows):
+            for byte_start in range(0, bitmap_bytes, block_bytes):
+                block = self.bitmaps[start:start + block_rows, byte_start:byte_start + block_bytes]
+                rows = np.unpackbits(block, axis=1, bitorder="little")
+                block_probabilities = scenario_probabilities[8 * byte_start:8 * byte_start + rows.shape[1]]
+                values[start:start + block_rows] += rows @ block_probabilities
+        return values
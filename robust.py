@@ -0,0 +1,52 @@
+"""
+Robust (worst-case) mechanism selection when credential probabilities are only known within bounds.
+
+Each credential's probabilities are given as a point (`CredentialProbabilities`), interval bounds
+(`CredentialProbabilityBounds`) or a polytope (a list of `CredentialProbabilities`, its vertices).
+The success probability is multilinear, i.e., linear in each credential's probabilities when the others
+are fixed, so its minimum over a product of polytopes is attained at a product of vertices.
+Worst cases are therefore computed exactly by evaluating all vertex combinations as a batch.
+"""
+
+import itertools
+import numpy as np
+from maximal_mechanisms import Mechanism, profile_matrix
+from scenarios import CredentialProbabilities, CredentialProbabilityBounds, scenario_probability_matrix
+from utils import best_with_ties
+
+def credential_vertices(bounds) -> list[tuple[float, ...]]:
+    """The vertices (probability vectors indexed by St.value) of one credential's bounds"""
+    if isinstance(bounds, CredentialProbabilities):
+        return [tuple(bounds.to_vector())]
+    if isinstance(bounds, CredentialProbabilityBounds):
+        return bounds.vertices()
+    if isinstance(bounds, (list, tuple)) and len(bounds) > 0 and all(isinstance(p, CredentialProbabilities) for p in bounds):
+        return [tuple(p.to_vector()) for p in bounds]
+    raise ValueError("Expected CredentialProbabilities, CredentialProbabilityBounds or a list of CredentialProbabilities, "
+                     "got %r (plain probability tuples are only accepted with exact=True)" % (bounds,))
+
+def worst_case_success_probabilities(mechanisms: list[Mechanism], bounds: list, chunk_size: int = 4096) -> np.ndarray:
+    """
+    Returns the worst-case success probability of every mechanism over the given per-credential bounds.
+    Vertex combinations are evaluated in chunks of `chunk_size` with one matrix product each.
+    """
+    if any(M.num_credentials != len(bounds) for M in mechanisms):
+        raise ValueError("Number of probabilities must match number of credentials")
+    profiles = profile_matrix(mechanisms)
+    worst = np.full(len(mechanisms), np.inf)
+    combinations = itertools.product(*[credential_vertices(b) for b in bounds])
+    while True:
+        chunk = list(itertools.islice(combinations, chunk_size))
+        if len(chunk) == 0:
+            break
+        values = scenario_probability_matrix(np.array(chunk)) @ profiles
+        worst = np.minimum(worst, values.min(axis=0))
+    return worst
+
+def find_most_robust_mechanisms(mechanisms: list[Mechanism], bounds: list):
+    """
+    Returns:
+        tuple: A tuple containing the mechanisms maximizing the worst-case success probability and that probability
+    """
+    (best, best_value) = best_with_ties(mechanisms, worst_case_success_probabilities(mechanisms, bounds))
+    return (best, float(best_value))
@@ -4,11 +4,14 @@ It includes:
 - An enumeration `St` representing different states of credentials (THEFT, LEAKED, LOST, SAFE).
 - A `Scenario` class to represent a scenario with multiple credentials and methods to compare and manipulate them.
 - Functions to generate all possible scenarios and special scenarios.
+- Array versions of the scenario space: all states at once for small n, or streamed in blocks for n up to about 14.
 - Utility functions to check if scenarios can coexist in a profile and to determine if a scenario is special.
 """
 
 from enum import Enum
-from itertools import permutations
+from functools import lru_cache
+from itertools import permutations, product
+import numpy as np
 class St(Enum):
     THEFT = 0
     LEAKED = 1
@@ -42,6 +45,50 @@ class CredentialProbabilities:
             return self.safe_prob
         raise ValueError("Invalid state")
 
+    # Probabilities indexed by St.value
+    def to_vector(self) -> list[float]:
+        return [self.get_probability(st) for st in St]
+
+class CredentialProbabilityBounds:
+    """
+    Interval bounds on the state probabilities of a credential, e.g., a theft probability between 5% and 15%.
+    The admissible probabilities form the polytope {p : lo <= p <= hi, sum(p) = 1}.
+    """
+    def __init__(self, theft_range: tuple[float, float], leaked_range: tuple[float, float],
+                 lost_range: tuple[float, float], safe_range: tuple[float, float]):
+        self.ranges = [theft_range, leaked_range, lost_range, safe_range] # Indexed by St.value
+        for (lo, hi) in self.ranges:
+            if not 0 <= lo <= hi <= 1:
+                raise ValueError("Bounds must satisfy 0 <= lo <= hi <= 1.")
+        if sum(lo for (lo, _) in self.ranges) > 1 + 1e-12 or sum(hi for (_, hi) in self.ranges) < 1 - 1e-12:
+            raise ValueError("No probabilities summing to 1 satisfy the bounds.")
+
+    def __repr__(self):
+        return "CredentialProbabilityBounds(THEFT=%s, LEAKED=%s, LOST=%s, SAFE=%s)" % tuple(self.ranges)
+
+    def vertices(self) -> list[tuple[float, ...]]:
+        """
+        The vertices of the polytope, as probability vectors indexed by St.value.
+        At a vertex, at least three probabilities are at one of their bounds and the last one is 1 minus their sum.
+        """
+        vertices = []
+        seen = set() # Up to rounding errors
+        for free in range(4):
+            others = [i for i in range(4) if i != free]
+            for choice in product([0, 1], repeat=3):
+                vertex = [0.0] * 4
+                for (i, c) in zip(others, choice):
+                    vertex[i] = self.ranges[i][c]
+                vertex[free] = 1 - sum(vertex[i] for i in others)
+                (lo, hi) = self.ranges[free]
+                if lo - 1e-12 <= vertex[free] <= hi + 1e-12:
+                    vertex[free] = min(max(vertex[free], lo), hi)
+                    key = tuple(round(p, 12) for p in vertex)
+                    if key not in seen:
+                        seen.add(key)
+                        vertices.append(tuple(vertex))
+        return vertices
+
 # Note: This notion is only required for proving completeness of the 3-credential set.
 # False doesn't necessarily imply "not worse or equal".
 # st2 & st1
@@ -80,6 +127,10 @@ class Scenario():
     
     def __hash__(self):
         return hash(tuple(self.credential_states))
+
+    # Position of the scenario in generate_all_scenarios(n): credential i is the i-th base-4 digit
+    def index(self) -> int:
+        return sum(state.value << (2 * i) for i, state in enumerate(self.credential_states))
     
     def is_complement(self, other) -> bool:
         if self.n != other.n:
@@ -156,6 +207,13 @@ class Profile:
                 return True
         return False
     
+    # Bit i is set iff scenario i of generate_all_scenarios(n) is in the profile
+    def bitmask(self) -> int:
+        mask = 0
+        for scenario in self.scenarios:
+            mask |= 1 << scenario.index()
+        return mask
+
     def success_probability(self, probabilities: list[CredentialProbabilities]) -> float:
         value = 0
         for scenario in self.scenarios:
@@ -202,6 +260,58 @@ def generate_all_scenarios(n):
         raise Exception(n, "is not supported. Max supported is", MAX_SUPPORTED)
     return ALL_SCENARIOS[n - 1]
 
+def unpack_states(indices: np.ndarray, n: int) -> np.ndarray:
+    """
+    The states of the scenarios with the given indices as a (len(indices), n) uint8 array of `St` values.
+    An index packs the states in 2 bits per credential: credential i of scenario j is in state (j >> 2i) & 3.
+    """
+    shifts = 2 * np.arange(n, dtype=np.int64)
+    return ((np.asarray(indices, dtype=np.int64)[:, None] >> shifts) & 3).astype(np.uint8)
+
+@lru_cache(maxsize=None)
+def scenario_state_array(n) -> np.ndarray:
+    """
+    The states of all 4^n scenarios as a read-only (4^n, n) uint8 array of `St` values.
+    Rows follow the order of `generate_all_scenarios(n)` (see unpack_states).
+    """
+    states = unpack_states(np.arange(4**n, dtype=np.int64), n)
+    states.flags.writeable = False
+    return states
+
+def scenario_blocks(n: int, block_size: int = 1 << 16, start: int = 0, stop: int = None, packed: bool = False):
+    """
+    Streams the scenarios start, ..., stop - 1 (all 4^n by default) in the order of `generate_all_scenarios(n)`
+    as blocks of at most block_size scenarios, without materializing them, so memory doesn't depend on n.
+
+    Yields:
+        The indices of the scenarios of the block (which are also their 2-bit packed states) if packed,
+        or (indices, states) with states as in unpack_states otherwise.
+    """
+    stop = 4**n if stop is None else stop
+    for block_start in range(start, stop, block_size):
+        indices = np.arange(block_start, min(block_start + block_size, stop), dtype=np.int64)
+        yield indices if packed else (indices, unpack_states(indices, n))
+
+def scenario_probability_matrix(credential_probabilities: np.ndarray) -> np.ndarray:
+    """
+    Scenario probabilities for a batch of B settings at once.
+
+    Args:
+        credential_probabilities: A (B, n, 4) array. Entry [b, i, st.value] is the probability that
+            credential i is in state st in setting b.
+
+    Returns:
+        A (B, 4^n) array whose row b has the probabilities of all scenarios (in the order of
+        generate_all_scenarios(n)) in setting b.
+    """
+    credential_probabilities = np.asarray(credential_probabilities, dtype=np.float64)
+    (B, n, _) = credential_probabilities.shape
+    # Credential 0 is the least significant base-4 digit of the scenario index, so it varies fastest
+    matrix = credential_probabilities[:, n - 1, :]
+    for i in range(n - 2, -1, -1):
+        matrix = (matrix[:, :, None] * credential_probabilities[:, i, None, :]).reshape(B, -1)
+    return matrix
+
 # A scenario is special if it has at least one SAFE and one THEFT credential.
 def is_special(s: Scenario):
     num_safe = 0
@@ -0,0 +1,70 @@
+"""
+Memoized best-mechanism queries.
+
+Policy engines ask `find_best_mechanisms`-style questions about a small set of recurring credential
+probabilities (e.g., standard device classes). A `MemoizedScorer` builds the profile matrix of its mechanism
+library once, and keeps the answers in an LRU cache keyed by the probabilities and a version hash of the
+library. Probabilities are normalized (rounded to 12 decimals, so that 0.1 + 0.2 and 0.3 hit the same entry),
+or optionally quantized to multiples of 1/resolution, in which case the quantized probabilities are the ones
+scored, so that every query sharing a key gets the answer for that key.
+"""
+
+import hashlib
+import numpy as np
+from lookup_table import quantize
+from maximal_mechanisms import Mechanism, profile_matrix
+from scenarios import CredentialProbabilities, scenario_probability_matrix
+from utils import LRUCache, best_with_ties
+
+def library_version(mechanisms: list[Mechanism]) -> str:
+    """A hash of the labels and profiles of the mechanisms, in order"""
+    digest = hashlib.sha256()
+    for M in mechanisms:
+        digest.update(M.label().encode())
+        digest.update(np.packbits(M.profile_indicator(), bitorder="little").tobytes())
+    return digest.hexdigest()[:16]
+
+def probability_key(probabilities: list[CredentialProbabilities], resolution: int = None) -> tuple:
+    if resolution is None:
+        return tuple(tuple(round(p, 12) + 0.0 for p in cp.to_vector()) for cp in probabilities)
+    return tuple(tuple(c / resolution for c in quantize(cp, resolution)) for cp in probabilities)
+
+class MemoizedScorer:
+    """
+    Answers best-mechanism queries over a mechanism library, caching the answers.
+
+    Attributes:
+        mechanisms (list[Mechanism]): The library.
+        version (str): The version hash of the library (see library_version).
+        resolution (int): If set, probabilities are quantized to multiples of 1/resolution.
+        cache (LRUCache): The answers, keyed by (version, probability key). It keeps the hit and miss counts.
+
+    Methods:
+        set_mechanisms(mechanisms): Replaces the library. Answers about the old library no longer hit.
+        find_best_mechanisms(probabilities): Same as three_credentials.find_best_mechanisms, over the library.
+    """
+    def __init__(self, mechanisms: list[Mechanism], resolution: int = None, maxsize: int = 1024):
+        self.resolution = resolution
+        self.cache = LRUCache(maxsize)
+        self.set_mechanisms(mechanisms)
+
+    def set_mechanisms(self, mechanisms: list[Mechanism]):
+        self.mechanisms = list(mechanisms)
+        self.version = library_version(self.mechanisms)
+        self._profiles = profile_matrix(self.mechanisms)
+
+    def find_best_mechanisms(self, probabilities: list[CredentialProbabilities]):
+        """
+        Returns:
+            tuple: A tuple containing the best mechanisms and their success probability
+        """
+        if any(M.num_credentials != len(probabilities) for M in self.mechanisms):
+            raise ValueError("Number of probabilities must match number of credentials")
+        key = (self.version, probability_key(probabilities, self.resolution))
+        answer = self.cache.get(key)
+        if answer is None:
+            scenario_probabilities = scenario_probability_matrix(np.array([key[1]]))
+            (best, best_value) = best_with_ties(self.mechanisms, (scenario_probabilities @ self._profiles)[0])
+            answer = (best, float(best_value))
+            self.cache.put(key, answer)
+        return (list(answer[0]), answer[1])
@@ -0,0 +1,50 @@
+"""
+Analytic gradients of success probabilities with respect to credential probabilities.
+
+The success probability is multilinear, so its partial derivative with respect to p_k(st) is the sum, over the
+scenarios of the profile where credential k is in state st, of the product of the other credentials'
+probabilities (the partial sums cached by `IncrementalScorer`). Replacing credential k's probabilities by the
+indicator of st in the scenario probabilities gives these products, so all 4n partial derivatives of all
+mechanisms, along with their values, come out of one (4n+1, 4^n) x (4^n, M) matrix product instead of
+4n+1 separate evaluations.
+"""
+
+import numpy as np
+from maximal_mechanisms import Mechanism, profile_matrix
+from scenarios import CredentialProbabilities, St, scenario_probability_matrix
+from utils import best_with_ties
+
+def success_probability_gradients(mechanisms: list[Mechanism],
+                                  probabilities: list[CredentialProbabilities]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns:
+        tuple: The (M,) success probabilities and the (M, n, 4) gradients, where entry [m, k, st.value] is the
+        partial derivative of mechanisms[m]'s success probability with respect to credential k's probability of st.
+    """
+    n = len(probabilities)
+    if any(M.num_credentials != n for M in mechanisms):
+        raise ValueError("Number of probabilities must match number of credentials")
+    p = np.array([cp.to_vector() for cp in probabilities])
+    settings = np.repeat(p[None, :, :], 4 * n + 1, axis=0)
+    for k in range(n):
+        for st in range(4):
+            settings[1 + 4 * k + st, k, :] = np.eye(4)[st]
+    values = scenario_probability_matrix(settings) @ profile_matrix(mechanisms)
+    return (values[0], values[1:].T.reshape(len(mechanisms), n, 4))
+
+def mass_shift_sensitivity(gradient: np.ndarray, credential: int, from_state: St, to_state: St) -> float:
+    """
+    The rate of change of the success probability when probability mass of a credential moves from one state to
+    another (e.g., reducing SMS theft in favour of SAFE), which keeps the probabilities summing to 1.
+    """
+    return float(gradient[credential, to_state.value] - gradient[credential, from_state.value])
+
+def best_mechanism_sensitivity(mechanisms: list[Mechanism], probabilities: list[CredentialProbabilities]):
+    """
+    Returns:
+        tuple: A tuple containing the best mechanisms, their success probability, and the (n, 4) gradient of the
+        first best mechanism
+    """
+    (values, gradients) = success_probability_gradients(mechanisms, probabilities)
+    (best, best_value) = best_with_ties(range(len(mechanisms)), values)
+    return ([mechanisms[i] for i in best], float(best_value), gradients[best[0]])
@@ -0,0 +1,80 @@
+"""
+Streaming analysis of the scenario space, block by block.
+
+`generate_all_scenarios` lists Scenario objects, which stops at n = 9. `scenario_blocks` streams the 4^n scenarios as
+NumPy blocks instead, and the functions below consume them one block at a time: memory depends on the block size
+(and on the 4^n / 8 bytes of a packed profile, when one is built), so exhaustive analysis at n = 10-14 only costs
+time. Sampling produces blocks in the same format, so anything that judges blocks also works on samples.
+"""
+
+import numpy as np
+from maximal_mechanisms import Mechanism
+from scenarios import CredentialProbabilities, scenario_blocks
+
+def _probability_array(probabilities: list[CredentialProbabilities]) -> np.ndarray:
+    return np.array([p.to_vector() for p in probabilities])
+
+def block_probabilities(states: np.ndarray, probabilities: np.ndarray) -> np.ndarray:
+    """The probability of every scenario of a block, given the (n, 4) array of credential probabilities"""
+    return np.prod(probabilities[np.arange(states.shape[1]), states], axis=1)
+
+def streaming_success_probabilities(mechanisms: list[Mechanism], probabilities: list[CredentialProbabilities],
+                                    block_size: int = 1 << 16) -> np.ndarray:
+    """The success probability of every mechanism, judging the scenarios block by block"""
+    n = len(probabilities)
+    if any(M.num_credentials != n for M in mechanisms):
+        raise ValueError("Number of probabilities must match number of credentials")
+    p = _probability_array(probabilities)
+    values = np.zeros(len(mechanisms))
+    for (_, states) in scenario_blocks(n, block_size):
+        scenario_probabilities = block_probabilities(states, p)
+        for (i, M) in enumerate(mechanisms):
+            values[i] += scenario_probabilities[M.succeeds_batch(states)].sum()
+    return values
+
+def streaming_profile_bitmap(M: Mechanism, block_size: int = 1 << 16) -> np.ndarray:
+    """The packed profile of M (as in ProfileStore), compiled block by block. block_size must be a multiple of 8."""
+    if block_size % 8 != 0:
+        raise ValueError("block_size must be a multiple of 8")
+    n = M.num_credentials
+    bitmap = np.zeros((4**n + 7) // 8, dtype=np.uint8)
+    for (indices, states) in scenario_blocks(n, block_size):
+        packed = np.packbits(M.succeeds_batch(states), bitorder="little")
+        bitmap[indices[0] // 8:indices[0] // 8 + len(packed)] = packed
+    return bitmap
+
+def streaming_profile_size(M: Mechanism, block_size: int = 1 << 16) -> int:
+    """The number of scenarios in the profile of M, without storing it"""
+    return sum(int(M.succeeds_batch(states).sum()) for (_, states) in scenario_blocks(M.num_credentials, block_size))
+
+def sample_scenario_blocks(probabilities: list[CredentialProbabilities], num_samples: int,
+                           block_size: int = 1 << 16, seed: int = None):
+    """
+    Yields blocks of (indices, states), as scenario_blocks does, of scenarios drawn independently
+    from the credential probabilities.
+    """
+    rng = np.random.default_rng(seed)
+    p = _probability_array(probabilities)
+    cumulative = np.cumsum(p, axis=1)
+    shifts = 2 * np.arange(len(probabilities), dtype=np.int64)
+    for start in range(0, num_samples, block_size):
+        size = min(block_size, num_samples - start)
+        u = rng.random((size, len(probabilities)))
+        # First state whose cumulative probability exceeds u (rounding can't select a state past SAFE)
+        states = np.minimum((u[:, :, None] >= cumulative[None, :, :]).sum(axis=2), 3).astype(np.uint8)
+        yield ((states.astype(np.int64) << shifts).sum(axis=1), states)
+
+def estimate_success_probability(M: Mechanism, probabilities: list[CredentialProbabilities], num_samples: int,
+                                 block_size: int = 1 << 16, seed: int = None) -> tuple[float, float]:
+    """
+    Monte Carlo estimate of the success probability of M, for when even streaming 4^n scenarios is too long.
+
+    Returns:
+        tuple: The estimate and its standard error
+    """
+    if len(probabilities) != M.num_credentials:
+        raise ValueError("Number of probabilities must match number of credentials")
+    wins = sum(int(M.succeeds_batch(states).sum())
+               for (_, states) in sample_scenario_blocks(probabilities, num_samples, block_size, seed))
+    estimate = wins / num_samples
+    return (estimate, float(np.sqrt(estimate * (1 - estimate) / num_samples)))
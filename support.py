@@ -0,0 +1,61 @@
+"""
+Support-aware scoring: only enumerate scenarios that can happen.
+
+Realistic inputs rule out many states, e.g., in `hdfc.py` the ID is always safe and the OTP is never leaked
+or lost. The support of a credential is the set of states with nonzero probability, and only the product of
+the supports (6 scenarios instead of 64 for HDFC) contributes to success probabilities. Restricted scenario
+tables are built lazily, once per combination of supports, and mechanisms are judged on them with
+`succeeds_batch`, so their full profiles are never needed.
+"""
+
+from functools import lru_cache
+from itertools import product
+import numpy as np
+from maximal_mechanisms import Mechanism
+from scenarios import CredentialProbabilities, Scenario, St
+from utils import best_with_ties
+
+def credential_support(probabilities: CredentialProbabilities) -> tuple[int, ...]:
+    """The values of the states with nonzero probability"""
+    return tuple(st.value for st in St if probabilities.get_probability(st) > 0)
+
+@lru_cache(maxsize=256)
+def restricted_state_array(supports: tuple[tuple[int, ...], ...]) -> np.ndarray:
+    """
+    The states of all scenarios in the product of the supports as a read-only (scenarios, credentials) uint8 array.
+    As in scenario_state_array, credential 0 varies fastest.
+    """
+    rows = [tuple(reversed(combination)) for combination in product(*reversed(supports))]
+    states = np.array(rows, dtype=np.uint8).reshape(len(rows), len(supports))
+    states.flags.writeable = False
+    return states
+
+@lru_cache(maxsize=256)
+def restricted_scenarios(supports: tuple[tuple[int, ...], ...]) -> list[Scenario]:
+    return [Scenario([St(int(v)) for v in row]) for row in restricted_state_array(supports)]
+
+def restricted_scenario_probabilities(probabilities: list[CredentialProbabilities]) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the restricted states and the probability of each of these scenarios"""
+    supports = tuple(credential_support(p) for p in probabilities)
+    states = restricted_state_array(supports)
+    p = np.array([cp.to_vector() for cp in probabilities])
+    return (states, np.prod(p[np.arange(len(probabilities)), states], axis=1))
+
+def support_success_probability(M: Mechanism, probabilities: list[CredentialProbabilities]) -> float:
+    if len(probabilities) != M.num_credentials:
+        raise ValueError("Number of probabilities must match number of credentials")
+    (states, scenario_probabilities) = restricted_scenario_probabilities(probabilities)
+    return float(scenario_probabilities[M.succeeds_batch(states)].sum())
+
+def find_best_mechanisms_on_support(probabilities: list[CredentialProbabilities], mechanisms: list[Mechanism]):
+    """
+    Like `find_best_mechanisms`, but only judges the scenarios in the product of the supports.
+
+    Returns:
+        tuple: A tuple containing the best mechanisms and their success probability
+    """
+    if any(M.num_credentials != len(probabilities) for M in mechanisms):
+        raise ValueError("Number of probabilities must match number of credentials")
+    (states, scenario_probabilities) = restricted_scenario_probabilities(probabilities)
+    values = [float(scenario_probabilities[M.succeeds_batch(states)].sum()) for M in mechanisms]
+    return best_with_ties(mechanisms, values)
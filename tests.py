@@ -1,10 +1,37 @@
 from scenarios import *
 from maximal_mechanisms import *
 
+from fractions import Fraction
+import itertools
+import math
+import numpy as np
+import os
+import random
+import tempfile
 import unittest
 
 from three_credentials import *
-from utils import generate_all_binary_tuples
+from utils import LRUCache, best_with_ties, generate_all_binary_tuples
+from incremental import IncrementalScorer
+from decision_diagrams import *
+from tie_break_orbits import *
+from pareto import non_dominated_indices, pareto_frontier
+from robust import *
+from population import PopulationScorer, find_population_best_mechanisms
+from lookup_table import *
+from profile_store import ProfileStore, write_profile_store
+from count_classes import *
+from support import *
+from sensitivity import *
+from mechanism_spec import *
+from checkpoint import *
+from scoring_cache import *
+from priority_wallet import *
+from weighted_search import *
+from differential import *
+from parallel_compile import *
+from streaming import *
+from exact import *
 
 class TestScenarios(unittest.TestCase):
     def test_all_scenarios(self):
@@ -274,6 +301,73 @@ class TestPriorityMechanisms(unittest.TestCase):
                             PriorityMechanism([0, 1, 2], True).profile)
 
 
+class TestPriorityMechanismFamily(unittest.TestCase):
+    def test_order_and_random_access(self):
+        family = PriorityMechanismFamily(4)
+        self.assertEqual(len(family), 48)
+        mechanisms = list(family)
+        self.assertEqual([m.label() for m in mechanisms], [family[i].label() for i in range(len(family))])
+        self.assertEqual((mechanisms[0].rule, mechanisms[0].exception), ([0, 1, 2, 3], True))
+        self.assertEqual((mechanisms[-1].rule, mechanisms[-1].exception), ([3, 2, 1, 0], False))
+        self.assertEqual(len(set(m.label() for m in mechanisms)), 48)
+        self.assertEqual(family[-1].label(), mechanisms[-1].label())
+        with self.assertRaises(IndexError):
+            family[48]
+
+    def test_large_family_is_lazy(self):
+        family = PriorityMechanismFamily(8)
+        self.assertEqual(len(family), 80640)
+        m = family[54321]
+        self.assertEqual(tuple(m.rule), list(itertools.permutations(range(8)))[54321 // 2])
+        self.assertEqual(m._profile, None)
+        self.assertEqual(sum(1 for _ in itertools.islice(family, 1000)), 1000)
+
+    def test_skip_equivalent(self):
+        family = PriorityMechanismFamily(2, skip_equivalent=True)
+        self.assertEqual([(m.rule, m.exception) for m in family], [([0, 1], True), ([0, 1], False)])
+        self.assertEqual(len(family), 2)
+        self.assertEqual(family[1].rule, [0, 1])
+        self.assertEqual(set(PriorityMechanism([0, 1], True).profile), set(PriorityMechanism([1, 0], False).profile))
+        self.assertEqual(len(PriorityMechanismFamily(3, skip_equivalent=True)), 12)
+
+class TestProfileCache(unittest.TestCase):
+    def test_lazy_shared_profiles(self):
+        PROFILE_CACHE.clear()
+        mechanisms = get_all_majority_mechanisms()
+        self.assertEqual(len(PROFILE_CACHE), 0)
+        self.assertTrue(all(m._profile is None for m in mechanisms))
+
+        tb = mechanisms[5].tie_break_label
+        m = MajorityMechanism(3, lambda x, y: tie_breaker_function_3creds(x, y, tb), tb, label_defines_tie_breaker=True)
+        self.assertIs(m.profile, mechanisms[5].profile)
+        self.assertEqual((PROFILE_CACHE.hits, PROFILE_CACHE.misses), (1, 1))
+        self.assertIs(PriorityMechanism([1, 0, 2], True).profile, PriorityMechanism([1, 0, 2], True).profile)
+        self.assertIsNot(PriorityMechanism([1, 0, 2], True).profile, PriorityMechanism([1, 0, 2], False).profile)
+
+    def test_same_label_different_tie_breakers(self):
+        (forward, backward) = [MajorityMechanism(3, lambda x, y, rule=rule: uniform_priority_tie_breaker(x, y, rule), [])
+                               for rule in [[0, 1, 2], [2, 1, 0]]]
+        self.assertEqual(forward.cache_key(), None)
+        self.assertIsNot(forward.profile, backward.profile)
+        self.assertNotEqual(forward.profile.bitmask(), backward.profile.bitmask())
+        self.assertEqual(backward.profile.bitmask(), backward.compute_profile().bitmask())
+
+    def test_lru_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3) # evicts b
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_best_with_ties(self):
+        self.assertEqual(best_with_ties("abcd", [0.25, 0.5, 0.125, 0.5]), (["b", "d"], 0.5))
+        self.assertEqual(best_with_ties("ab", np.zeros(2)), (["a", "b"], 0.0))
+        self.assertEqual(best_with_ties([], []), ([], 0))
+
 class TestPREMechanisms(unittest.TestCase):    
     def test_priority_with_exception(self):
         # decider_one
@@ -425,5 +519,759 @@ class TestThreeCredentialCompleteSets(unittest.TestCase):
         majority_mechanisms = [m for m in unique_mechanisms if "majority" in m.label()]
         self.assertEqual(len(majority_mechanisms), 12)
 
+class TestIncrementalScorer(unittest.TestCase):
+    def test_update_matches_full_rescoring(self):
+        mechanisms = get_all_priority_mechanisms() + get_all_majority_mechanisms()[:8]
+        probabilities = [CredentialProbabilities(0, 0.15, 0.15, 0.7),
+                         CredentialProbabilities(0.1, 0, 0, 0.9),
+                         CredentialProbabilities(0, 0, 0, 1)]
+        scorer = IncrementalScorer(mechanisms, probabilities)
+        for M, value in zip(mechanisms, scorer.scores()):
+            self.assertAlmostEqual(value, M.success_probability(probabilities))
+
+        # Tweak the OTP theft probability, then another credential
+        for (credential, cp) in [(1, CredentialProbabilities(0.25, 0, 0, 0.75)),
+                                 (1, CredentialProbabilities(0.05, 0.05, 0, 0.9)),
+                                 (0, CredentialProbabilities(0.1, 0.2, 0.3, 0.4))]:
+            probabilities[credential] = cp
+            scores = scorer.update(credential, cp)
+            for M, value in zip(mechanisms, scores):
+                self.assertAlmostEqual(value, M.success_probability(probabilities))
+
+        (best, value) = scorer.best_mechanisms()
+        self.assertAlmostEqual(value, max(M.success_probability(probabilities) for M in mechanisms))
+        self.assertTrue(len(best) > 0)
+
+class TestDecisionDiagrams(unittest.TestCase):
+    def test_priority_diagrams_match_profiles(self):
+        for rule in [[0, 1, 2], [2, 0, 1], [1, 2, 0, 3], [3, 1, 0, 2]]:
+            for exception in [True, False]:
+                M = PriorityMechanism(rule, exception)
+                d = priority_diagram(rule, exception)
+                for s in generate_all_scenarios(len(rule)):
+                    self.assertEqual(d.succeeds(s), M.succeeds(s))
+                self.assertEqual(d.count(), len(M.profile))
+                self.assertEqual(d, scenario_diagram(len(rule), M.succeeds))
+
+    def test_majority_diagrams(self):
+        probabilities = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4)] * 3
+        for M in get_all_majority_mechanisms()[:16]:
+            d = compile_mechanism(M)
+            self.assertEqual(d.count(), 28)
+            self.assertAlmostEqual(d.success_probability(probabilities), M.success_probability(probabilities))
+
+        t = lambda x, y: uniform_priority_tie_breaker(x, y, [2, 0, 1, 3])
+        self.assertEqual(uniform_priority_majority_diagram(4, [2, 0, 1, 3]), majority_diagram(4, t))
+
+    def test_equivalence(self):
+        # With two credentials, the exception swaps the rule
+        self.assertEqual(priority_diagram([0, 1], True), priority_diagram([1, 0], False))
+        self.assertNotEqual(priority_diagram([0, 1, 2], True), priority_diagram([0, 1, 2], False))
+        self.assertEqual(uniform_priority_majority_diagram(2, [0, 1]), priority_diagram([0, 1], False))
+
+    def test_large_number_of_credentials(self):
+        n = 40
+        for d in [priority_diagram(list(range(n)), False),
+                  priority_diagram(list(range(n)), True),
+                  uniform_priority_majority_diagram(n, list(range(n)))]:
+            self.assertEqual(d.count(), (4**n - 2**n) // 2)
+            self.assertLess(len(d), 2000)
+        # The user wins iff the first credential is safe, or it is leaked or lost and the second is safe, ...
+        d = priority_diagram(list(range(n)), False)
+        p = CredentialProbabilities(0.1, 0.2, 0.3, 0.4)
+        expected = sum(0.4 * 0.5**i for i in range(n))
+        self.assertAlmostEqual(d.success_probability([p] * n), expected)
+
+class TestBatchJudging(unittest.TestCase):
+    def test_state_array_order(self):
+        states = scenario_state_array(3)
+        for s, row in zip(generate_all_scenarios(3), states):
+            self.assertEqual([St(int(v)) for v in row], s.credential_states)
+
+    def test_priority_batch(self):
+        for n in [2, 3, 4]:
+            states = scenario_state_array(n)
+            for rule in itertools.permutations(range(n)):
+                for exception in [True, False]:
+                    m = PriorityMechanism(list(rule), exception)
+                    self.assertEqual(list(m.succeeds_batch(states)),
+                                     [m.succeeds(s) for s in generate_all_scenarios(n)])
+
+    def test_majority_batch(self):
+        states = scenario_state_array(3)
+        for m in get_all_majority_mechanisms():
+            self.assertEqual(list(m.succeeds_batch(states)), [m.succeeds(s) for s in generate_all_scenarios(3)])
+        t = lambda x, y: uniform_priority_tie_breaker(x, y, [3, 1, 0, 2])
+        m = MajorityMechanism(4, t, [3, 1, 0, 2])
+        self.assertEqual(list(m.succeeds_batch(scenario_state_array(4))),
+                         [m.succeeds(s) for s in generate_all_scenarios(4)])
+
+class TestTieBreakOrbits(unittest.TestCase):
+    def test_three_credentials(self):
+        orbits = list(majority_tie_break_orbits(3))
+        self.assertEqual(len(orbits), 12)
+        self.assertEqual(sum(size for (_, size) in orbits), 64)
+        mechanisms = [m for (m, _) in get_distinct_majority_mechanisms(3)]
+        for i, m1 in enumerate(mechanisms):
+            for m2 in mechanisms[:i]:
+                self.assertNotEqual(m1.profile, m2.profile)
+
+    def test_four_credentials(self):
+        self.assertEqual(number_of_majority_tie_break_orbits(3), 12)
+        self.assertEqual(number_of_majority_tie_break_orbits(4), 5592576)
+        actions = signed_permutations(4)
+        for (label, size) in itertools.islice(majority_tie_break_orbits(4, block_size=1 << 12), 50):
+            orbit = set()
+            for action in actions:
+                image = [0] * len(label)
+                for j, (k, flip) in enumerate(action):
+                    image[k] = label[j] ^ flip
+                orbit.add(tuple(image))
+            self.assertEqual(min(orbit), tuple(label))
+            self.assertEqual(len(orbit), size)
+
+    def test_label_tie_breaker(self):
+        all_possible_inputs = generate_tie_break_inputs([0, 1, 2, 3])
+        label = [(7 * j) % 3 % 2 for j in range(len(all_possible_inputs))]
+        tie_breaker = label_tie_breaker(4, label)
+        for (S1, S2) in all_possible_inputs:
+            self.assertEqual(tie_breaker(S1, S2), break_ties(S1, S2, all_possible_inputs, label))
+            self.assertEqual(tie_breaker(S2, S1), break_ties(S2, S1, all_possible_inputs, label))
+
+class MobileFirstMechanism(Mechanism):
+    """The HDFC mechanism (see hdfc.py): mobile safe, or mobile lost and ID safe"""
+    def succeeds(self, scenario):
+        states = scenario.credential_states
+        return states[1] == St.SAFE or (states[1] == St.LOST and states[2] == St.SAFE)
+
+    def label(self):
+        return "mobile first"
+
+class TestPareto(unittest.TestCase):
+    def test_bitmasks(self):
+        m = PriorityMechanism([0, 1, 2], True)
+        self.assertEqual(m.profile_bitmask(), m.profile.bitmask())
+        self.assertEqual(m.profile_bitmask().bit_count(), 28)
+        for i, s in enumerate(generate_all_scenarios(3)):
+            self.assertEqual(s.index(), i)
+
+    def test_non_dominated_indices(self):
+        self.assertEqual(non_dominated_indices([0b0011, 0b0111, 0b1000, 0b0111, 0, 0b1100]), [1, 3, 5])
+        self.assertEqual(non_dominated_indices([0]), [0])
+        self.assertEqual(non_dominated_indices([]), [])
+
+    def test_pareto_frontier(self):
+        maximal = get_all_3cred_mechanisms()
+        mobile_first = MobileFirstMechanism(3)
+        self.assertEqual(len(mobile_first.profile), 20)
+        frontier = pareto_frontier([mobile_first] + maximal)
+        self.assertEqual([m.label() for m in frontier], [m.label() for m in maximal])
+
+class TestRobustSelection(unittest.TestCase):
+    def test_vertices(self):
+        otp = CredentialProbabilityBounds((0.05, 0.15), (0, 0), (0, 0), (0.85, 0.95))
+        self.assertEqual(len(otp.vertices()), 2)
+        for (vertex, expected) in zip(sorted(otp.vertices()), [(0.05, 0, 0, 0.95), (0.15, 0, 0, 0.85)]):
+            for (p, q) in zip(vertex, expected):
+                self.assertAlmostEqual(p, q)
+        box = CredentialProbabilityBounds((0, 0.1), (0.1, 0.2), (0.1, 0.2), (0, 1))
+        self.assertEqual(len(box.vertices()), 8)
+        with self.assertRaises(ValueError):
+            CredentialProbabilityBounds((0.6, 0.7), (0.5, 0.6), (0, 0), (0, 0))
+        # Plain tuples are exact-mode input, not bounds
+        with self.assertRaisesRegex(ValueError, "exact=True"):
+            find_best_mechanisms([(0.7, 0.1, 0.1, 0.1)] * 3)
+        with self.assertRaises(ValueError):
+            credential_vertices([])
+
+    def test_scenario_probabilities(self):
+        probabilities = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4), CredentialProbabilities(0, 0.15, 0.15, 0.7)]
+        q = scenario_probability_matrix(np.array([[p.to_vector() for p in probabilities]]))
+        for (value, s) in zip(q[0], generate_all_scenarios(2)):
+            self.assertAlmostEqual(value, s.success_probability(probabilities))
+
+    def test_worst_case(self):
+        password = CredentialProbabilityBounds((0, 0.1), (0.1, 0.2), (0.1, 0.2), (0, 1))
+        mobile = [CredentialProbabilities(0.1, 0, 0, 0.9), CredentialProbabilities(0.2, 0.1, 0, 0.7)]
+        otp = CredentialProbabilityBounds((0.05, 0.15), (0, 0), (0, 0), (0.85, 0.95))
+        mechanisms = get_complete_maximal_set()
+        worst = worst_case_success_probabilities(mechanisms, [password, mobile, otp], chunk_size=5)
+        for (M, value) in zip(mechanisms, worst):
+            corners = [M.success_probability([CredentialProbabilities(*p) for p in combination])
+                       for combination in itertools.product([(0.1, 0.1, 0.1, 0.7), (0, 0.2, 0.2, 0.6)],
+                                                            [(0.1, 0, 0, 0.9), (0.2, 0.1, 0, 0.7)],
+                                                            [(0.15, 0, 0, 0.85)])]
+            self.assertLessEqual(value, min(corners) + 1e-12)
+
+        (best, value) = find_best_mechanisms([password, mobile, otp])
+        self.assertAlmostEqual(value, max(worst))
+        self.assertTrue(all("majority" in M.label() for M in best))
+        # A point is a polytope with one vertex
+        probabilities = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.1, 0, 0, 0.9),
+                         CredentialProbabilities(0, 0, 0, 1)]
+        (_, value) = find_most_robust_mechanisms(mechanisms, [probabilities[0], [probabilities[1]], probabilities[2]])
+        self.assertAlmostEqual(value, max(M.success_probability(probabilities) for M in mechanisms))
+
+class TestPopulation(unittest.TestCase):
+    def test_weighted_mixture(self):
+        mechanisms = get_complete_maximal_set()
+        hardware_key = [CredentialProbabilities(0.05, 0.05, 0.1, 0.8), CredentialProbabilities(0.1, 0, 0, 0.9),
+                        CredentialProbabilities(0, 0, 0.01, 0.99)]
+        sms_only = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.2, 0, 0.1, 0.7),
+                    CredentialProbabilities(0.3, 0.3, 0.2, 0.2)]
+        population = []
+        for i in range(50):
+            population.append((3, hardware_key, "hardware key"))
+            population.append((1, sms_only, "sms"))
+        population.append((2, sms_only))
+        (best, value, breakdown) = find_population_best_mechanisms(mechanisms, population, chunk_size=7)
+
+        expected = [(150 * M.success_probability(hardware_key) + 52 * M.success_probability(sms_only)) / 202
+                    for M in mechanisms]
+        self.assertAlmostEqual(value, max(expected))
+        best_index = max(range(len(mechanisms)), key=lambda i: expected[i])
+        self.assertTrue(any(M is mechanisms[best_index] for M in best))
+
+        (weight, (segment_best, segment_value)) = breakdown["sms"]
+        self.assertEqual(weight, 50)
+        self.assertAlmostEqual(segment_value, max(M.success_probability(sms_only) for M in mechanisms))
+        self.assertEqual(set(breakdown), {"hardware key", "sms"})
+
+    def test_empty_population(self):
+        scorer = PopulationScorer(get_all_priority_mechanisms())
+        with self.assertRaises(ValueError):
+            scorer.best_mechanisms()
+
+class TestLookupTable(unittest.TestCase):
+    def test_lookup(self):
+        mechanisms = get_complete_maximal_set()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "best.lut")
+            build_lookup_table(path, mechanisms, resolution=4)
+            table = MechanismLookupTable(path, mechanisms)
+            self.assertEqual(table.winners.shape, (35, 35, 35))
+
+            # On grid points, the lookup is exact
+            grid = [(a / 4, b / 4, c / 4, (4 - a - b - c) / 4)
+                    for a in range(5) for b in range(5 - a) for c in range(5 - a - b)]
+            rng = random.Random(0)
+            for _ in range(100):
+                probabilities = [CredentialProbabilities(*rng.choice(grid)) for _ in range(3)]
+                best_value = max(M.success_probability(probabilities) for M in mechanisms)
+                self.assertAlmostEqual(table.best_mechanism(probabilities).success_probability(probabilities), best_value)
+
+            # Off the grid, rechecking never makes it worse
+            probabilities = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.1, 0, 0, 0.9),
+                             CredentialProbabilities(0.05, 0.05, 0.05, 0.85)]
+            approximate = table.best_mechanism(probabilities).success_probability(probabilities)
+            rechecked = table.best_mechanism(probabilities, recheck=True).success_probability(probabilities)
+            self.assertGreaterEqual(rechecked, approximate)
+
+            with self.assertRaises(ValueError):
+                MechanismLookupTable(path, mechanisms[1:])
+            del table
+
+    def test_quantize(self):
+        self.assertEqual(quantize(CredentialProbabilities(0, 0.15, 0.15, 0.7), 8), (0, 1, 1, 6))
+        self.assertEqual(sum(quantize(CredentialProbabilities(0.1, 0.2, 0.3, 0.4), 7)), 7)
+
+class TestProfileStore(unittest.TestCase):
+    def test_round_trip(self):
+        mechanisms = get_complete_maximal_set()
+        probabilities = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.1, 0, 0, 0.9),
+                         CredentialProbabilities(0.05, 0.05, 0.05, 0.85)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profiles.prf")
+            write_profile_store(path, mechanisms)
+            store = ProfileStore(path)
+            self.assertEqual(len(store), 14)
+            self.assertEqual(store.labels, [M.label() for M in mechanisms])
+            for M, value in zip(mechanisms, store.success_probabilities(probabilities, max_bytes=5 * 72 * 8)):
+                self.assertIn(M.label(), store)
+                bitmap = store.bitmap(M.label())
+                self.assertTrue(np.shares_memory(bitmap, store.bitmaps))
+                self.assertEqual(int.from_bytes(bitmap.tobytes(), "little"), M.profile_bitmask())
+                self.assertEqual(store.count(M.label()), 28)
+                self.assertEqual(list(np.flatnonzero(store.indicator(M.label()))), sorted(s.index() for s in M.profile))
+                self.assertAlmostEqual(value, M.success_probability(probabilities))
+            del store
+
+    def test_larger_profiles(self):
+        mechanisms = [PriorityMechanism(list(range(7)), True), PriorityMechanism(list(range(7)), False)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profiles.prf")
+            write_profile_store(path, mechanisms)
+            store = ProfileStore(path)
+            self.assertEqual(store.bitmaps.shape, (2, 4**7 // 8))
+            (a, b) = (store.bitmap(m.label()) for m in mechanisms)
+            # Set operations on the views: the exception swaps some scenarios
+            self.assertEqual(int(np.bitwise_count(a & ~b).sum()), int(np.bitwise_count(b & ~a).sum()))
+            self.assertGreater(int(np.bitwise_count(a ^ b).sum()), 0)
+            # Blocks of 100 bytes of one bitmap at a time
+            probabilities = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4)] * 7
+            for (M, value) in zip(mechanisms, store.success_probabilities(probabilities, max_bytes=72 * 100)):
+                self.assertAlmostEqual(value, M.success_probability(probabilities))
+            del store, a, b
+
+class TestCountClasses(unittest.TestCase):
+    def test_classes(self):
+        self.assertEqual(len(count_classes(3)), 20)
+        self.assertEqual(len(count_classes(50)), math.comb(53, 3))
+        self.assertEqual(sum(class_size(c) for c in count_classes(5)), 4**5)
+        probabilities = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4), CredentialProbabilities(0, 0.15, 0.15, 0.7),
+                         CredentialProbabilities(0.1, 0, 0, 0.9)]
+        expected = {}
+        for s in generate_all_scenarios(3):
+            counts = (s.theft, s.leaked, s.lost, s.safe)
+            expected[counts] = expected.get(counts, 0) + s.success_probability(probabilities)
+        distribution = class_probabilities(probabilities)
+        for counts in count_classes(3):
+            self.assertAlmostEqual(distribution.get(counts, 0), expected[counts])
+
+    def test_majority(self):
+        iid = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4)] * 3
+        different = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4), CredentialProbabilities(0, 0.15, 0.15, 0.7),
+                     CredentialProbabilities(0.1, 0, 0, 0.9)]
+        for M in get_all_majority_mechanisms():
+            for probabilities in [iid, different]:
+                self.assertAlmostEqual(majority_success_probability(M, probabilities), M.success_probability(probabilities))
+
+        rule = [4, 2, 0, 1, 3, 5]
+        M = MajorityMechanism(6, lambda x, y: uniform_priority_tie_breaker(x, y, rule), rule)
+        probabilities = [CredentialProbabilities(0.05 * i, 0.1, 0.2, 0.7 - 0.05 * i) for i in range(6)]
+        self.assertAlmostEqual(majority_success_probability(M, probabilities), M.success_probability(probabilities))
+
+    def test_many_symmetric_credentials(self):
+        # Without ties (odd n, no leaked or lost), majority wins iff more than half of the credentials are safe
+        p = CredentialProbabilities(0.3, 0, 0, 0.7)
+        value = symmetric_success_probability(lambda c: c[St.SAFE.value] > c[St.THEFT.value], [p] * 41)
+        expected = sum(math.comb(41, k) * 0.7**k * 0.3**(41 - k) for k in range(21, 42))
+        self.assertAlmostEqual(value, expected)
+
+class TestSupport(unittest.TestCase):
+    def test_hdfc_supports(self):
+        probabilities = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.1, 0, 0, 0.9),
+                         CredentialProbabilities(0, 0, 0, 1)]
+        supports = tuple(credential_support(p) for p in probabilities)
+        self.assertEqual(supports, ((1, 2, 3), (0, 3), (3,)))
+        scenarios = restricted_scenarios(supports)
+        self.assertEqual(len(scenarios), 6)
+        self.assertEqual([s.index() for s in scenarios], sorted(s.index() for s in scenarios))
+        self.assertAlmostEqual(sum(s.success_probability(probabilities) for s in scenarios), 1)
+
+        mechanisms = get_complete_maximal_set()
+        for M in mechanisms:
+            self.assertAlmostEqual(support_success_probability(M, probabilities), M.success_probability(probabilities))
+        (best, value) = find_best_mechanisms_on_support(probabilities, mechanisms)
+        self.assertAlmostEqual(value, max(M.success_probability(probabilities) for M in mechanisms))
+
+    def test_profiles_are_not_needed(self):
+        m = PriorityMechanism(list(range(9)), True)
+        probabilities = [CredentialProbabilities(0.5, 0, 0, 0.5)] * 9
+        self.assertAlmostEqual(support_success_probability(m, probabilities), 0.5)
+        self.assertIsNone(m._profile)
+
+class TestSensitivity(unittest.TestCase):
+    def test_gradients(self):
+        mechanisms = get_complete_maximal_set()
+        probabilities = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4), CredentialProbabilities(0, 0.15, 0.15, 0.7),
+                         CredentialProbabilities(0.1, 0, 0, 0.9)]
+        (values, gradients) = success_probability_gradients(mechanisms, probabilities)
+        self.assertEqual(gradients.shape, (14, 3, 4))
+        for credential in range(3):
+            scorer = IncrementalScorer(mechanisms, probabilities)
+            for (M, value, gradient, partial_sums) in zip(mechanisms, values, gradients, scorer.partial_sums(credential)):
+                self.assertAlmostEqual(value, M.success_probability(probabilities))
+                for st in St:
+                    self.assertAlmostEqual(gradient[credential, st.value], partial_sums[st.value])
+
+    def test_mass_shift(self):
+        # Priority [0, 1]: P = s0 + (l0 + o0) * s1
+        m = PriorityMechanism([0, 1], False)
+        probabilities = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4), CredentialProbabilities(0.2, 0.1, 0, 0.7)]
+        (best, value, gradient) = best_mechanism_sensitivity([m], probabilities)
+        self.assertAlmostEqual(value, 0.4 + 0.5 * 0.7)
+        self.assertAlmostEqual(mass_shift_sensitivity(gradient, 0, St.THEFT, St.SAFE), 1)
+        self.assertAlmostEqual(mass_shift_sensitivity(gradient, 0, St.LEAKED, St.SAFE), 1 - 0.7)
+        self.assertAlmostEqual(mass_shift_sensitivity(gradient, 1, St.THEFT, St.SAFE), 0.5)
+
+HDFC_SPEC_JSON = """
+{"name": "HDFC Bank", "num_credentials": 3,
+ "rules": [{"if": {"1": "safe"}, "then": true}, {"if": {"1": "lost", "2": "safe"}, "then": true}],
+ "default": false}
+"""
+
+class TestMechanismSpec(unittest.TestCase):
+    def test_spec_profile(self):
+        spec = SpecMechanism.from_json(HDFC_SPEC_JSON)
+        self.assertEqual(len(spec.profile), 20)
+        self.assertEqual(spec.profile_bitmask(), MobileFirstMechanism(3).profile_bitmask())
+        for scenario in generate_all_scenarios(3):
+            self.assertEqual(spec.succeeds(scenario), MobileFirstMechanism(3).succeeds(scenario))
+        # A priority mechanism as a decision list: the first safe or stolen credential in priority order decides
+        rules = []
+        for (i, credential) in enumerate([2, 0, 1]):
+            undecided = {c: ["leaked", "lost"] for c in [2, 0, 1][:i]}
+            rules.append({"if": undecided | {credential: "safe"}, "then": True})
+            rules.append({"if": undecided | {credential: "theft"}, "then": False})
+        spec = SpecMechanism({"num_credentials": 3, "rules": rules})
+        self.assertEqual(spec.profile_bitmask(), PriorityMechanism([2, 0, 1], False).profile_bitmask())
+        with self.assertRaises(ValueError):
+            SpecMechanism({"num_credentials": 2, "rules": [{"if": {2: "safe"}, "then": True}]})
+        with self.assertRaises(ValueError):
+            SpecMechanism({"num_credentials": 2, "rules": [{"if": {1: "stolen"}, "then": True}]})
+
+    def test_spec_diagram(self):
+        n = 12
+        spec = SpecMechanism({"num_credentials": n, "default": False, "rules": [
+            {"if": {0: "safe", 5: ["safe", "leaked"]}, "then": True},
+            {"if": {3: "theft"}, "then": False},
+            {"if": {11: "safe"}, "then": True}]})
+        diagram = compile_mechanism(spec)
+        states = np.random.default_rng(0).integers(0, 4, size=(2000, n), dtype=np.uint8)
+        wins = spec.succeeds_batch(states)
+        for (row, win) in zip(states, wins):
+            scenario = Scenario([St(int(v)) for v in row])
+            self.assertEqual(diagram.succeeds(scenario), win)
+            self.assertEqual(spec.succeeds(scenario), win)
+        small = SpecMechanism.from_json(HDFC_SPEC_JSON)
+        self.assertEqual(compile_mechanism(small).count(), 20)
+
+    def test_audit(self):
+        probabilities = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.1, 0, 0, 0.9),
+                         CredentialProbabilities(0, 0, 0, 1)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "specs.json")
+            with open(path, "w") as f:
+                f.write("[%s]" % HDFC_SPEC_JSON)
+            specs = load_specs(path)
+            maximal = get_all_3cred_mechanisms()
+            [(value, best_value, containing)] = audit_mechanisms(specs, maximal, probabilities)
+            self.assertAlmostEqual(value, 0.9)
+            self.assertAlmostEqual(best_value, 1.0)
+            self.assertTrue(len(containing) > 0)
+            self.assertTrue(all(specs[0].profile_bitmask() != M.profile_bitmask() for M in containing))
+
+class TestCheckpoint(unittest.TestCase):
+    def test_resume_after_crash(self):
+        with tempfile.TemporaryDirectory() as directory:
+            items = lambda start, stop: ((i, i * i) for i in range(start, stop))
+            visited = []
+            crash = [False, True]
+
+            def visit(index, item, state):
+                if index == 37 and crash.pop():
+                    raise InterruptedError # The job is killed
+                visited.append(index)
+                state["total"] += item
+
+            path = os.path.join(directory, "squares.json")
+            with self.assertRaises(InterruptedError):
+                resumable_search(path, items, visit, 0, 100, {"total": 0}, save_every=10)
+            self.assertEqual(load_checkpoint(path)["cursor"], 30)
+            del visited[30:] # Lost with the process
+            state = resumable_search(path, items, visit, 0, 100, {"total": 0}, save_every=10)
+            self.assertEqual(visited, list(range(100)))
+            self.assertEqual(state["total"], sum(i * i for i in range(100)))
+            self.assertTrue(load_checkpoint(path)["done"])
+            with self.assertRaises(ValueError):
+                resumable_search(path, items, visit, 0, 50)
+
+    def test_split_best_search(self):
+        probabilities = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4), CredentialProbabilities(0, 0.15, 0.15, 0.7),
+                         CredentialProbabilities(0.1, 0, 0, 0.9)]
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(split_range(0, 10, 3), [(0, 4), (4, 7), (7, 10)])
+            family = PriorityMechanismFamily(3)
+            states = [best_mechanism_search(os.path.join(directory, "priority%s.json" % i), sequence_items(family),
+                                            probabilities, start, stop)
+                      for (i, (start, stop)) in enumerate(split_range(0, len(family), 4))]
+            merged = merge_best_results(states)
+            values = [M.success_probability(probabilities) for M in family]
+            self.assertEqual(merged["best_value"], max(values))
+            self.assertEqual([index for (index, _) in merged["best"]], [i for i in range(12) if values[i] == max(values)])
+            # Majority orbits are indexed by their label
+            items = majority_orbit_items(3)
+            states = [best_mechanism_search(os.path.join(directory, "majority%s.json" % i), items, probabilities, start, stop)
+                      for (i, (start, stop)) in enumerate(split_range(0, 2**6, 3))]
+            merged = merge_best_results(states)
+            full = best_mechanism_search(os.path.join(directory, "majority.json"), items, probabilities, 0, 2**6)
+            self.assertEqual(merged, full)
+
+    def test_complete_set_proof(self):
+        import complete_set_proof
+        for (i, profile) in enumerate(complete_set_proof.all_possible_profiles):
+            self.assertEqual(complete_set_proof.profile_from_index(i), profile)
+        solutions = [i for (i, profile) in enumerate(complete_set_proof.all_possible_profiles)
+                     if complete_set_proof.is_valid_profile(profile)]
+        with tempfile.TemporaryDirectory() as directory:
+            states = [complete_set_proof.checkpointedSolve(os.path.join(directory, "proof%s.json" % i), start, stop)
+                      for (i, (start, stop)) in enumerate(split_range(0, 2**9, 2))]
+        self.assertEqual(states[0]["solutions"] + states[1]["solutions"], solutions)
+
+class TestScoringCache(unittest.TestCase):
+    def test_memoized_queries(self):
+        mechanisms = get_complete_maximal_set()
+        scorer = MemoizedScorer(mechanisms, maxsize=2)
+        hdfc = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.1, 0, 0, 0.9),
+                CredentialProbabilities(0, 0, 0, 1)]
+        (best, value) = scorer.find_best_mechanisms(hdfc)
+        (expected_best, expected_value) = find_best_mechanisms(hdfc)
+        self.assertAlmostEqual(value, expected_value)
+        self.assertEqual([M.label() for M in best], [M.label() for M in expected_best])
+        self.assertEqual((scorer.cache.hits, scorer.cache.misses), (0, 1))
+        # Same probabilities up to float noise
+        noisy = [CredentialProbabilities(0, 0.15, 0.15000000000000002, 0.7)] + hdfc[1:]
+        scorer.find_best_mechanisms(noisy)
+        self.assertEqual((scorer.cache.hits, scorer.cache.misses), (1, 1))
+        # Eviction
+        scorer.find_best_mechanisms(list(reversed(hdfc)))
+        scorer.find_best_mechanisms([hdfc[1], hdfc[0], hdfc[2]])
+        scorer.find_best_mechanisms(hdfc)
+        self.assertEqual((scorer.cache.hits, scorer.cache.misses), (1, 4))
+        # A new library has a new version
+        version = scorer.version
+        scorer.set_mechanisms(get_all_priority_mechanisms())
+        self.assertNotEqual(scorer.version, version)
+        (best, value) = scorer.find_best_mechanisms(hdfc)
+        self.assertEqual((scorer.cache.hits, scorer.cache.misses), (1, 5))
+        self.assertTrue(all(isinstance(M, PriorityMechanism) for M in best))
+
+    def test_quantized_keys(self):
+        scorer = MemoizedScorer(get_all_priority_mechanisms(), resolution=10)
+        p = [CredentialProbabilities(0.1, 0.2, 0.3, 0.4), CredentialProbabilities(0, 0.15, 0.15, 0.7),
+             CredentialProbabilities(0.1, 0, 0, 0.9)]
+        q = [CredentialProbabilities(0.11, 0.19, 0.3, 0.4)] + p[1:]
+        self.assertEqual(probability_key(p, 10), probability_key(q, 10))
+        self.assertEqual(scorer.find_best_mechanisms(p), scorer.find_best_mechanisms(q))
+        self.assertEqual(scorer.cache.hits, 1)
+
+class TestPriorityWallet(unittest.TestCase):
+    def test_matches_priority_mechanism(self):
+        rng = random.Random(1)
+        for n in range(1, 5):
+            rule = list(range(n))
+            rng.shuffle(rule)
+            m = PriorityMechanism(rule, False)
+            for scenario in generate_all_scenarios(n):
+                for algorithm in ALGORITHMS:
+                    self.assertEqual(wallet_outcome(rule, scenario, algorithm), m.priority_judging_function(scenario))
+
+    def test_contract_semantics(self):
+        wallet = PriorityWallet(["a", "b", "c"])
+        with self.assertRaises(Revert):
+            wallet.create_new_claim("a", 5, "x") # No withdrawal in progress
+        wallet.initiate_withdrawal("c")
+        first = wallet.create_new_claim("c", 5, "x")
+        second = wallet.create_new_claim("b", 7, "y")
+        wallet.add_approval("c", second)
+        self.assertEqual(wallet.get_claim_supporters(second), [False, False, True, True])
+        with self.assertRaises(Revert):
+            wallet.add_approval("d", first)
+        with self.assertRaises(Revert):
+            wallet.withdraw() # Not expired
+        wallet.advance_time(PriorityWallet.delay + 1)
+        with self.assertRaises(Revert):
+            wallet.add_approval("a", first)
+        self.assertEqual(wallet.withdraw("bitmask"), second)
+        self.assertFalse(wallet.withdrawal_in_progress)
+
+    def test_benchmark(self):
+        report = benchmark(16, 500, 2000)
+        self.assertEqual(report["bitmask"]["withdraw_operations"], 500)
+        self.assertEqual(report["incremental"]["withdraw_operations"], 1)
+        self.assertTrue(report["scan"]["withdraw_operations"] > 16 * 500)
+
+class TestWeightedMechanism(unittest.TestCase):
+    def test_special_cases(self):
+        rule = [2, 0, 3, 1]
+        majority = MajorityMechanism(4, lambda S1, S2: uniform_priority_tie_breaker(S1, S2, rule), [])
+        self.assertEqual(WeightedMechanism([1, 1, 1, 1], rule).profile_bitmask(), majority.profile_bitmask())
+        weights = [0] * 4
+        for (rank, x) in enumerate(rule):
+            weights[x] = 2**(3 - rank)
+        self.assertEqual(WeightedMechanism(weights).profile_bitmask(),
+                         PriorityMechanism(rule, False).profile_bitmask())
+        with self.assertRaises(ValueError):
+            WeightedMechanism([1, -1])
+
+    def test_dynamic_program(self):
+        rng = random.Random(3)
+        grid = [(a / 8, b / 8, c / 8, (8 - a - b - c) / 8)
+                for a in range(9) for b in range(9 - a) for c in range(9 - a - b)]
+        for n in range(1, 6):
+            probabilities = [CredentialProbabilities(*rng.choice(grid)) for _ in range(n)]
+            rule = list(range(n))
+            rng.shuffle(rule)
+            M = WeightedMechanism([rng.randint(0, 4) for _ in range(n)], rule)
+            self.assertAlmostEqual(M.success_probability(probabilities), M.profile.success_probability(probabilities))
+            for scenario in generate_all_scenarios(n)[::7]:
+                self.assertEqual(M.succeeds(scenario), scenario in M.profile)
+
+    def test_search(self):
+        probabilities = [CredentialProbabilities(0, 0.15, 0.15, 0.7), CredentialProbabilities(0.1, 0, 0, 0.9),
+                         CredentialProbabilities(0, 0, 0, 1)]
+        (best, value) = find_best_weighted_mechanisms(probabilities, 3)
+        self.assertTrue(len(best) > 0)
+        self.assertAlmostEqual(value, max(WeightedMechanism(w).success_probability(probabilities)
+                                          for w in itertools.product(range(4), repeat=3)))
+        # 20 credentials: a strong key and many weak ones
+        probabilities = [CredentialProbabilities(0.01, 0, 0.04, 0.95)] + \
+            [CredentialProbabilities(0.2, 0.2, 0.1, 0.5) for _ in range(19)]
+        start = [1] * 20
+        (M, improved) = improve_weights(probabilities, start, 5)
+        self.assertTrue(improved >= WeightedMechanism(start).success_probability(probabilities))
+        self.assertAlmostEqual(improved, M.success_probability(probabilities))
+
+class TestDifferential(unittest.TestCase):
+    def test_engines_agree(self):
+        report = run_differential(num_cases=16, num_credentials=range(2, 5), dedup_credentials=range(2, 4))
+        self.assertEqual(report["failures"], [])
+        self.assertEqual(report["dedup_failures"], [])
+        self.assertIn("reference", report["throughput"])
+
+    def test_detects_and_shrinks(self):
+        case = {"kind": "priority", "num_credentials": 4, "params": {"rule": [3, 1, 0, 2], "exception": True},
+                "probabilities": [(0.125, 0.25, 0.5, 0.125), (0.5, 0, 0.25, 0.25), (0.25, 0.25, 0.5, 0), (0, 0, 0.5, 0.5)]}
+        self.assertEqual(check_case(case), [])
+        # An engine that forgets the exception
+        original = PriorityMechanism.succeeds_batch
+        try:
+            PriorityMechanism.succeeds_batch = lambda self, states: original(PriorityMechanism(self.rule, False), states)
+            failures = check_case(case)
+            self.assertIn("succeeds_batch", failures)
+            self.assertIn("matrix_probability", failures)
+            self.assertNotIn("diagram_profile", failures)
+            shrunk = shrink_case(case)
+        finally:
+            PriorityMechanism.succeeds_batch = original
+        self.assertEqual(shrunk["num_credentials"], 2)
+        self.assertEqual(shrunk["params"], {"rule": [0, 1], "exception": True})
+
+class TestParallelCompile(unittest.TestCase):
+    def test_matches_compute_profile(self):
+        rule = [3, 0, 4, 1, 2]
+        mechanisms = [PriorityMechanism(rule, True),
+                      MajorityMechanism(5, lambda S1, S2: uniform_priority_tie_breaker(S1, S2, rule), []),
+                      MobileFirstMechanism(3), PriorityMechanism([0], False)]
+        for M in mechanisms:
+            bitmap = compile_bitmap_parallel(M, processes=2, chunk_size=100)
+            self.assertEqual(int.from_bytes(bitmap.tobytes(), "little"), M.compute_profile().bitmask())
+        profile = compile_profile_parallel(mechanisms[0], processes=2, chunk_size=64)
+        self.assertEqual(profile.bitmask(), mechanisms[0].profile.bitmask())
+        self.assertEqual(len(profile), len(mechanisms[0].profile))
+
+    def test_tables_built_before_fork(self):
+        rule = [3, 0, 4, 1, 2]
+        parent = os.getpid()
+
+        def tie_breaker(S1, S2):
+            if os.getpid() != parent:
+                raise Exception("The tie break table was rebuilt in a worker")
+            return uniform_priority_tie_breaker(S1, S2, rule)
+        M = MajorityMechanism(5, tie_breaker, [])
+        bitmap = compile_bitmap_parallel(M, processes=2, chunk_size=64)
+        self.assertEqual(int.from_bytes(bitmap.tobytes(), "little"), M.compute_profile().bitmask())
+        self.assertEqual(sorted(benchmark_compile(M, [1, 2], chunk_size=64)), [1, 2])
+
+class TestStreaming(unittest.TestCase):
+    def test_blocks(self):
+        blocks = list(scenario_blocks(3, block_size=7))
+        self.assertEqual(len(blocks), 10)
+        self.assertTrue(np.array_equal(np.concatenate([states for (_, states) in blocks]), scenario_state_array(3)))
+        indices = np.concatenate(list(scenario_blocks(3, block_size=7, start=5, stop=40, packed=True)))
+        self.assertTrue(np.array_equal(indices, np.arange(5, 40)))
+        self.assertTrue(np.array_equal(unpack_states(indices, 3), scenario_state_array(3)[5:40]))
+
+    def test_streaming_scoring(self):
+        probabilities = [CredentialProbabilities(0.125, 0.25, 0.125, 0.5), CredentialProbabilities(0, 0.5, 0, 0.5),
+                         CredentialProbabilities(0.25, 0, 0.25, 0.5), CredentialProbabilities(0.5, 0.25, 0, 0.25)]
+        mechanisms = [PriorityMechanism([2, 0, 3, 1], True), WeightedMechanism([2, 1, 1, 3])]
+        values = streaming_success_probabilities(mechanisms, probabilities, block_size=24)
+        for (M, value) in zip(mechanisms, values):
+            self.assertAlmostEqual(value, M.profile.success_probability(probabilities))
+            self.assertEqual(streaming_profile_size(M, block_size=24), len(M.profile))
+            (estimate, error) = estimate_success_probability(M, probabilities, 20000, block_size=3000, seed=0)
+            self.assertTrue(abs(estimate - value) < 5 * error)
+
+    def test_beyond_listed_scenarios(self):
+        n = 10
+        M = PriorityMechanism(list(range(n)), True)
+        bitmap = streaming_profile_bitmap(M)
+        self.assertTrue(np.array_equal(bitmap, np.packbits(M.profile_indicator(), bitorder="little")))
+        probabilities = [CredentialProbabilities(0.25, 0.25, 0.25, 0.25)] * n
+        self.assertAlmostEqual(streaming_success_probabilities([M], probabilities)[0],
+                               compile_mechanism(M).success_probability(probabilities))
+
+def fraction_success_probability(M, probabilities):
+    """The exact success probability, scenario by scenario with Fractions"""
+    return sum(math.prod(Fraction(repr(probabilities[i].get_probability(st))) for (i, st) in enumerate(s.credential_states))
+               for s in M.profile)
+
+class TestExactScoring(unittest.TestCase):
+    def test_exact_ties(self):
+        mechanisms = get_complete_maximal_set()
+        probabilities = [CredentialProbabilities(0.1, 0.4, 0, 0.5), CredentialProbabilities(0, 0.1, 0.5, 0.4),
+                         CredentialProbabilities(0.2, 0.2, 0.4, 0.2)]
+        (best, value) = find_best_mechanisms_exact(probabilities, mechanisms)
+        self.assertEqual(value, Fraction(177, 250))
+        self.assertEqual(len(best), 3) # The float sums only find one of them
+        for M in mechanisms:
+            self.assertEqual(fraction_success_probability(M, probabilities) == value, any(M is B for B in best))
+        groups = ExactScorer(mechanisms).tie_groups(probabilities)
+        self.assertEqual(sum(len(group) for (_, group) in groups), len(mechanisms))
+        self.assertEqual([v for (v, _) in groups], sorted([v for (v, _) in groups], reverse=True))
+
+    def test_large_denominators(self):
+        mechanisms = get_complete_maximal_set()
+        probabilities = [CredentialProbabilities(0.1234567891234, 0.2, 0.3, 0.3765432108766),
+                         CredentialProbabilities(Fraction(1, 3), Fraction(1, 7), 0, Fraction(11, 21)),
+                         CredentialProbabilities(0.0000000001, 0.25, 0.25, 0.4999999999)]
+        (values, denominator) = exact_success_probabilities(mechanisms, probabilities)
+        self.assertTrue(denominator >= 2**63)
+        for (M, value) in zip(mechanisms, values):
+            expected = sum(math.prod(exact_probability(probabilities[i].get_probability(st))
+                                     for (i, st) in enumerate(s.credential_states)) for s in M.profile)
+            self.assertEqual(Fraction(value, denominator), expected)
+
+    def test_numpy_probabilities(self):
+        rows = [np.array([0.1, 0.2, 0.3, 0.4]), np.array([0, 0.15, 0.15, 0.7]), np.array([0.1, 0, 0, 0.9])]
+        probabilities = [CredentialProbabilities(*row) for row in rows]
+        self.assertIsInstance(probabilities[0].theft_prob, np.float64)
+        self.assertEqual(exact_probability(np.float64(0.1)), Fraction(1, 10))
+        self.assertEqual(exact_probability(np.int64(1)), 1)
+        (best, value) = find_best_mechanisms(probabilities, exact=True)
+        self.assertEqual((best, value), find_best_mechanisms_exact([tuple(row.tolist()) for row in rows],
+                                                                   get_complete_maximal_set()))
+
+    def test_limbs(self):
+        # 1/3 reads as 3333333333333333/10^16, so the common denominator is far above 2^63
+        mechanisms = list(itertools.islice(PriorityMechanismFamily(5), 0, 240, 17))
+        probabilities = [CredentialProbabilities(1/3, 1/3, 0, 1 - 2/3), CredentialProbabilities(0.1, 0.2, 0.3, 0.4),
+                         CredentialProbabilities(1/3, 0, 2/3, 0), CredentialProbabilities(0, 0.15, 0.15, 0.7),
+                         CredentialProbabilities(1/7, 2/7, 0, 4/7)]
+        (values, denominator) = ExactScorer(mechanisms).success_probabilities(probabilities)
+        self.assertTrue(denominator >= 2**100)
+        # The decimals of a credential may not sum to exactly 1; they are normalized
+        exact = [[f / sum(fractions) for f in fractions]
+                 for fractions in (exact_credential_probabilities(p) for p in probabilities)]
+        for (M, value) in zip(mechanisms, values):
+            expected = sum(math.prod(exact[i][st.value] for (i, st) in enumerate(s.credential_states)) for s in M.profile)
+            self.assertEqual(Fraction(value, denominator), expected)
+
+    def test_exact_tuples(self):
+        # The float sums of these aren't 1, so CredentialProbabilities rejects them
+        probabilities = [(0.7, 0.1, 0.1, 0.1), (0.6, 0.1, 0.2, 0.1), ("0.3", "0.3", "0.3", Fraction(1, 10))]
+        with self.assertRaises(ValueError):
+            CredentialProbabilities(*probabilities[0])
+        (best, value) = find_best_mechanisms(probabilities, exact=True)
+        values = [sum(math.prod(exact_credential_probabilities(probabilities[i])[st.value]
+                                for (i, st) in enumerate(s.credential_states)) for s in M.profile)
+                  for M in get_complete_maximal_set()]
+        self.assertEqual(value, max(values))
+        self.assertEqual(len(best), values.count(max(values)))
+        with self.assertRaises(ValueError):
+            find_best_mechanisms([(0.7, 0.1, 0.1, 0.2)] * 3, exact=True)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
 
+from exact import find_best_mechanisms_exact
 from maximal_mechanisms import *
-from utils import generate_all_binary_tuples
+from robust import find_most_robust_mechanisms
+from utils import best_with_ties, generate_all_binary_tuples
 
 def get_all_majority_mechanisms() -> list[Mechanism]:
     """
@@ -11,7 +13,9 @@ def get_all_majority_mechanisms() -> list[Mechanism]:
         list of tuples: A list where each tuple contains a label (str) and a profile (object).
     """
     all_tie_breaks = generate_all_binary_tuples(6)
-    return [MajorityMechanism(3, lambda x, y: tie_breaker_function_3creds(x, y, tb), tb) for tb in all_tie_breaks]
+    # Bind tb at definition time, otherwise every tie breaker would use the last tie break
+    return [MajorityMechanism(3, lambda x, y, tb=tb: tie_breaker_function_3creds(x, y, tb), tb, label_defines_tie_breaker=True)
+            for tb in all_tie_breaks]
 
 def get_all_priority_mechanisms() -> list[Mechanism]:
     """
@@ -22,12 +26,7 @@ def get_all_priority_mechanisms() -> list[Mechanism]:
         list of tuple: A list of tuples where each tuple contains a label (str) 
         describing the rule and exception, and the corresponding profile object.
     """
-    mechanisms = []
-    for rule in [[0, 1, 2], [1, 0, 2], [2, 0, 1], [0, 2, 1], [1, 2, 0], [2, 1, 0]]:
-        for exception in [True, False]:
-            m = PriorityMechanism(rule, exception)
-            mechanisms.append(m)
-    return mechanisms
+    return list(PriorityMechanismFamily(3))
 
 def get_all_3cred_mechanisms():
     return get_all_majority_mechanisms() + get_all_priority_mechanisms()
@@ -40,7 +39,7 @@ def get_complete_maximal_set() -> list[Mechanism]:
             unique_mechanisms.append(m)
     return unique_mechanisms
 
-def find_best_mechanisms(probabilities: list[CredentialProbabilities]):
+def find_best_mechanisms(probabilities: list[CredentialProbabilities], exact: bool = False):
     """
     Identifies the best mechanisms based on their success probabilities.
 
@@ -49,26 +48,34 @@ def find_best_mechanisms(probabilities: list[CredentialProbabilities]):
     mechanism, calculates the total success probability for each scenario in the mechanism's 
     profile, and compares it to find the best mechanisms.
 
+    Robust mode: if some credential's probabilities are only known within bounds (CredentialProbabilityBounds,
+    or a list of CredentialProbabilities spanning a polytope), the best mechanisms maximize the worst-case
+    success probability instead (see robust.py).
+
+    Exact mode: with exact=True, success probabilities are computed with integer arithmetic (see exact.py), so
+    ties are decided exactly and the success probability is a Fraction. Credentials may then also be given as
+    (theft, leaked, lost, safe) tuples of decimals or Fractions, e.g. (0.7, 0.1, 0.1, 0.1), whose float sum is not 1.
+
     Args:
         probabilities (list[CredentialProbabilities]): A list of credential probabilities 
         used to calculate the success probability of each mechanism.
+        exact (bool): Whether to use exact mode.
 
     Returns:
         tuple: A tuple containing the best mechanisms and their success probability
     """
     if len(probabilities) != 3:
         raise ValueError("Number of probabilities must match number of credentials")
-    best_mechanisms = []
-    best_profile_value = 0
+    if exact:
+        return find_best_mechanisms_exact(probabilities, get_complete_maximal_set())
+    if not all(isinstance(p, CredentialProbabilities) for p in probabilities):
+        return find_most_robust_mechanisms(get_complete_maximal_set(), probabilities)
     all_mechanisms = get_complete_maximal_set()
+    values = []
     for M in all_mechanisms:
         value = 0
         for scenario in M.profile:
             value += scenario.success_probability(probabilities)
         print(value, M)
-        if value > best_profile_value:
-            best_profile_value = value
-            best_mechanisms = [M]
-        elif value == best_profile_value:
-            best_mechanisms.append(M)
-    return (best_mechanisms, best_profile_value)
+        values.append(value)
+    return best_with_ties(all_mechanisms, values)
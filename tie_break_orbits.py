@@ -0,0 +1,131 @@
+"""
+Enumerates majority tie breakers up to credential symmetry.
+
+A tie break label assigns a bit to every input pair (S1, S2) of `generate_tie_break_inputs(range(n))`.
+Renaming credentials with a permutation p maps the pair (S1, S2) to (p(S1), p(S2)), which is either
+another input pair or its reverse (in which case the bit flips). Majority mechanisms whose labels are in
+the same orbit under this action have the same profile up to permutation (`Profile.__eq__`), so listing
+one label per orbit lists the distinct majority mechanisms without the generate-then-dedup step.
+"""
+
+import functools
+import itertools
+import numpy as np
+from maximal_mechanisms import MajorityMechanism, generate_tie_break_inputs
+
+@functools.lru_cache(maxsize=None)
+def tie_break_input_positions(num_credentials: int) -> dict:
+    """
+    Maps (tuple(S1), tuple(S2)) to (j, 0) if it is input pair j of `generate_tie_break_inputs(range(num_credentials))`
+    and to (j, 1) if it is the reverse of pair j. Computed once per number of credentials; must not be modified.
+    """
+    position = {}
+    for j, (S1, S2) in enumerate(generate_tie_break_inputs(list(range(num_credentials)))):
+        position[(tuple(S1), tuple(S2))] = (j, 0)
+        position[(tuple(S2), tuple(S1))] = (j, 1)
+    return position
+
+def signed_permutations(num_credentials: int) -> list[list[tuple[int, int]]]:
+    """
+    Returns the action of every credential permutation (in itertools.permutations order, so the identity
+    comes first) on the tie break inputs: entry j of the action is (j', flip) if pair j maps to pair j'
+    (flip = 0) or to its reverse (flip = 1).
+    """
+    position = tie_break_input_positions(num_credentials)
+    all_possible_inputs = [pair for (pair, (_, flip)) in position.items() if flip == 0] # In input order
+    actions = []
+    for perm in itertools.permutations(range(num_credentials)):
+        actions.append([position[(tuple(sorted(perm[i] for i in S1)), tuple(sorted(perm[i] for i in S2)))]
+                        for (S1, S2) in all_possible_inputs])
+    return actions
+
+def number_of_majority_tie_break_orbits(num_credentials: int) -> int:
+    """
+    Counts the orbits with Burnside's lemma. A label is fixed by a signed permutation iff it is constant on
+    every cycle with an even number of flips, and there is no fixed label if some cycle has an odd number.
+    """
+    actions = signed_permutations(num_credentials)
+    total = 0
+    for action in actions:
+        seen = [False] * len(action)
+        cycles = 0
+        for start in range(len(action)):
+            if seen[start]:
+                continue
+            cycles += 1
+            flips = 0
+            j = start
+            while not seen[j]:
+                seen[j] = True
+                (j, flip) = action[j]
+                flips += flip
+            if flips % 2 == 1:
+                cycles = None
+                break
+        if cycles is not None:
+            total += 2**cycles
+    return total // len(actions)
+
+def majority_tie_break_orbits(num_credentials: int, block_size: int = 1 << 20, start: int = 0, stop: int = None):
+    """
+    Yields (tie_break_label, orbit_size) for exactly one label per orbit: the lexicographically smallest one.
+
+    Labels are scanned as integers (label[0] is the most significant bit) in blocks of `block_size`,
+    from start (included) to stop (excluded, all labels by default), so that the scan can be split or resumed.
+    For every block, each non-identity permutation is applied with byte lookup tables, and the labels
+    that map to something smaller are dropped. The orbit size is the number of permutations over the
+    number of permutations fixing the label.
+    """
+    actions = signed_permutations(num_credentials)
+    m = len(actions[0])
+    if m > 63:
+        raise ValueError("%s tie break inputs don't fit in 64 bits" % (m,))
+    num_chunks = (m + 7) // 8
+    # tables[g, c, v] is the image under g of the chunk value v at bits 8c..8c+7. Label index j is bit m-1-j.
+    tables = np.zeros((len(actions), num_chunks, 256), dtype=np.uint64)
+    flips = np.zeros(len(actions), dtype=np.uint64)
+    for g, action in enumerate(actions):
+        for j, (image, flip) in enumerate(action):
+            bit = m - 1 - j
+            (c, b) = divmod(bit, 8)
+            values = np.arange(256)
+            tables[g, c, (values >> b) & 1 == 1] |= np.uint64(1 << (m - 1 - image))
+            if flip:
+                flips[g] |= np.uint64(1 << (m - 1 - image))
+
+    def apply(g, labels):
+        image = np.full(len(labels), flips[g], dtype=np.uint64)
+        for c in range(num_chunks):
+            image ^= tables[g, c][(labels >> np.uint64(8 * c)) & np.uint64(255)]
+        return image
+
+    stop = 2**m if stop is None else min(stop, 2**m)
+    for block_start in range(start, stop, block_size):
+        candidates = np.arange(block_start, min(block_start + block_size, stop), dtype=np.uint64)
+        for g in range(1, len(actions)):
+            candidates = candidates[candidates <= apply(g, candidates)]
+        stabilizer = np.ones(len(candidates), dtype=np.int64)
+        for g in range(1, len(actions)):
+            stabilizer += apply(g, candidates) == candidates
+        for (value, fixed) in zip(candidates.tolist(), stabilizer.tolist()):
+            yield ([(value >> (m - 1 - j)) & 1 for j in range(m)], len(actions) // fixed)
+
+def label_tie_breaker(num_credentials: int, tie_break_label: list[int]):
+    """
+    The tie breaker defined by a label over `generate_tie_break_inputs(range(num_credentials))`, as in `break_ties`,
+    with a dictionary lookup instead of a scan of the inputs
+    """
+    position = tie_break_input_positions(num_credentials)
+    if len(position) != 2 * len(tie_break_label):
+        raise Exception("Input size does not match tie breaker size %s %s" % (len(position) // 2, len(tie_break_label)))
+
+    def tie_breaker(S1, S2) -> bool:
+        (j, flip) = position[(tuple(S1), tuple(S2))]
+        return bool(tie_break_label[j] ^ flip)
+    return tie_breaker
+
+def get_distinct_majority_mechanisms(num_credentials: int):
+    """Yields (mechanism, orbit_size) for one majority mechanism per equivalence class"""
+    for (label, orbit_size) in majority_tie_break_orbits(num_credentials):
+        yield (MajorityMechanism(num_credentials, label_tie_breaker(num_credentials, label), label,
+                                label_defines_tie_breaker=True), orbit_size)
@@ -40,6 +40,21 @@ def compositions(n):
             result.append([i] + p)  # Append current part and recurse on the rest
     return result
 
+def best_with_ties(items, values):
+    """
+    Finds the items with the highest value, keeping all the items that tie for it.
+
+    Args:
+        items: The items (e.g., mechanisms).
+        values: The value of every item, in the same order.
+
+    Returns:
+        tuple: A tuple containing the best items (in their original order) and their value (0 if there are no items)
+    """
+    values = list(values)
+    best_value = max(values, default=0)
+    return ([item for (item, value) in zip(items, values) if value == best_value], best_value)
+
 # Removes the blatant duplicates from a list of profiles
 def remove_duplicates(profiles):
     # Get unique profiles
@@ -48,3 +63,50 @@ def remove_duplicates(profiles):
         if len([p for (_, p) in unique_profiles if p == profile]) == 0:
             unique_profiles.append((label, profile))
     return unique_profiles
+
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    A size-bounded mapping that evicts the least recently used entry when full.
+
+    Attributes:
+        maxsize (int): The maximum number of entries.
+        hits (int): The number of successful lookups.
+        misses (int): The number of failed lookups.
+    """
+    def __init__(self, maxsize: int):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __repr__(self):
+        return "LRUCache(%s/%s entries, %s hits, %s misses)" % (len(self), self.maxsize, self.hits, self.misses)
+
+    def get(self, key, default=None):
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,53 @@
+"""
+Searches over the weight vectors of weighted mechanisms (see WeightedMechanism).
+
+Weighted mechanisms are scored with their dynamic program, so policies with 20+ credentials are cheap to evaluate.
+Scaling all weights by the same factor doesn't change the mechanism, so only weight vectors whose gcd is 1 are
+enumerated. The exhaustive search is for a few credentials; with many, `improve_weights` does coordinate ascent
+from a starting weight vector.
+"""
+
+import itertools
+import math
+from maximal_mechanisms import WeightedMechanism
+from scenarios import CredentialProbabilities
+from utils import best_with_ties
+
+def weight_vectors(num_credentials: int, max_weight: int):
+    """Yields the weight vectors in {0, ..., max_weight}^n whose gcd is 1"""
+    for weights in itertools.product(range(max_weight + 1), repeat=num_credentials):
+        if math.gcd(*weights) == 1:
+            yield list(weights)
+
+def find_best_weighted_mechanisms(probabilities: list[CredentialProbabilities], max_weight: int,
+                                  rule: list[int] = None):
+    """
+    Returns:
+        tuple: A tuple containing the best weighted mechanisms (weights up to max_weight, tie-break rule `rule`)
+        and their success probability
+    """
+    mechanisms = [WeightedMechanism(weights, rule) for weights in weight_vectors(len(probabilities), max_weight)]
+    return best_with_ties(mechanisms, [M.success_probability(probabilities) for M in mechanisms])
+
+def improve_weights(probabilities: list[CredentialProbabilities], weights: list[int], max_weight: int,
+                    rule: list[int] = None, max_rounds: int = 100):
+    """
+    Coordinate ascent: repeatedly sets each credential's weight to its best value in {0, ..., max_weight},
+    the others being fixed, until no change improves the success probability.
+
+    Returns:
+        tuple: A tuple containing the final weighted mechanism and its success probability
+    """
+    weights = list(weights)
+    best_value = WeightedMechanism(weights, rule).success_probability(probabilities)
+    for _ in range(max_rounds):
+        improved = False
+        for k in range(len(weights)):
+            for w in range(max_weight + 1):
+                candidate = weights[:k] + [w] + weights[k + 1:]
+                value = WeightedMechanism(candidate, rule).success_probability(probabilities)
+                if value > best_value + 1e-12: # Ignore rounding noise
+                    (weights, best_value, improved) = (candidate, value, True)
+        if not improved:
+            break
+    return (WeightedMechanism(weights, rule), best_value)